@@ -0,0 +1,251 @@
+import asyncio
+import itertools
+import os
+import random
+import time
+from dataclasses import dataclass
+
+from aiohttp import web
+
+# servidor local que imita as APIs do ToonBr e do MangaFlix, as CDNs de
+# imagens e a Bot API do Telegram, para benchmarks sem rede
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.05
+    jitter: float = 0.01
+    error_rate: float = 0.0
+    page_size: int = 300 * 1024
+    pages: int = 30
+    chapters: int = 50
+    results: int = 5
+    upload_latency: float = 0.2
+
+
+def _page_blob(size):
+    # começa como JPEG para o CBZ gravar sem recompressão
+    return b"\xff\xd8\xff\xe0" + os.urandom(max(size - 4, 0))
+
+
+class FakeServer:
+
+    def __init__(self, config):
+        self.config = config
+        self.blob = _page_blob(config.page_size)
+        self.message_ids = itertools.count(1)
+        self.stats = {
+            "api_requests": 0,
+            "image_requests": 0,
+            "image_errors": 0,
+            "telegram_requests": 0,
+            "upload_bytes": 0,
+        }
+        self.runner = None
+        self.base_url = None
+
+    # ================= AUXILIARES =================
+    async def _delay(self, base=None):
+        base = self.config.latency if base is None else base
+        await asyncio.sleep(max(0.0, random.gauss(base, self.config.jitter)))
+
+    def _failure(self):
+        if random.random() >= self.config.error_rate:
+            return None
+
+        self.stats["image_errors"] += 1
+        if random.random() < 0.5:
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        return web.Response(status=503)
+
+    def _image(self, chapter_id, page):
+        return web.Response(
+            body=self.blob[:4] + f"{chapter_id}/{page}".encode() + self.blob[4:],
+            content_type="image/jpeg",
+        )
+
+    def _titles(self, query):
+        return [f"{query} {i}" for i in range(1, self.config.results + 1)]
+
+    # ================= TOONBR =================
+    async def toonbr_search(self, request):
+        self.stats["api_requests"] += 1
+        await self._delay()
+        query = request.query.get("search", "")
+        return web.json_response({
+            "data": [
+                {"title": title, "slug": f"tb-{i}"}
+                for i, title in enumerate(self._titles(query))
+            ]
+        })
+
+    async def toonbr_manga(self, request):
+        self.stats["api_requests"] += 1
+        await self._delay()
+        slug = request.match_info["slug"]
+        return web.json_response({
+            "title": f"Manga {slug}",
+            "chapters": [
+                {"name": f"Capítulo {n}", "chapterNumber": n, "id": f"{slug}-{n}"}
+                for n in range(1, self.config.chapters + 1)
+            ],
+        })
+
+    async def toonbr_chapter(self, request):
+        self.stats["api_requests"] += 1
+        await self._delay()
+        chapter_id = request.match_info["chapter_id"]
+        return web.json_response({
+            "pages": [
+                {"imageUrl": f"/{chapter_id}/{p}.jpg"}
+                for p in range(1, self.config.pages + 1)
+            ]
+        })
+
+    # ================= MANGAFLIX =================
+    async def mangaflix_search(self, request):
+        self.stats["api_requests"] += 1
+        await self._delay()
+        query = request.query.get("query", "")
+        return web.json_response({
+            "data": [
+                {"name": title, "_id": f"mf-{i}"}
+                for i, title in enumerate(self._titles(query))
+            ]
+        })
+
+    async def mangaflix_manga(self, request):
+        self.stats["api_requests"] += 1
+        await self._delay()
+        manga_id = request.match_info["manga_id"]
+        return web.json_response({
+            "data": {
+                "name": f"Manga {manga_id}",
+                "chapters": [
+                    {"number": str(n), "_id": f"{manga_id}-{n}"}
+                    for n in range(self.config.chapters, 0, -1)
+                ],
+            }
+        })
+
+    async def mangaflix_chapter(self, request):
+        self.stats["api_requests"] += 1
+        await self._delay()
+        chapter_id = request.match_info["chapter_id"]
+        return web.json_response({
+            "data": {
+                "images": [
+                    {"default_url": f"{self.base_url}/mangaflix-cdn/{chapter_id}/{p}.jpg"}
+                    for p in range(1, self.config.pages + 1)
+                ]
+            }
+        })
+
+    # ================= CDN =================
+    async def cdn_image(self, request):
+        self.stats["image_requests"] += 1
+        await self._delay()
+        failure = self._failure()
+        if failure is not None:
+            return failure
+        return self._image(request.match_info["chapter_id"], request.match_info["page"])
+
+    # ================= TELEGRAM =================
+    def _message(self, chat_id, **extra):
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id or 0), "type": "private"},
+            **extra,
+        }
+
+    async def telegram(self, request):
+        self.stats["telegram_requests"] += 1
+        method = request.match_info["method"].lower()
+
+        params = dict(request.query)
+        if request.content_type == "application/json":
+            params.update(await request.json())
+        elif request.can_read_body:
+            for name, value in (await request.post()).items():
+                if isinstance(value, web.FileField):
+                    self.stats["upload_bytes"] += len(value.file.read())
+                    params[name] = value.filename
+                else:
+                    params[name] = value
+
+        chat_id = params.get("chat_id")
+
+        if method == "senddocument":
+            await self._delay(self.config.upload_latency)
+            result = self._message(chat_id, document={
+                "file_id": f"file-{next(self.message_ids)}",
+                "file_unique_id": f"u-{next(self.message_ids)}",
+                "file_name": params.get("document"),
+            })
+        elif method == "getme":
+            result = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Bench",
+                "username": "bench_bot",
+                "can_join_groups": True,
+                "can_read_all_group_messages": False,
+                "supports_inline_queries": False,
+            }
+        elif method in ("sendmessage", "editmessagetext", "sendphoto"):
+            await self._delay()
+            result = self._message(chat_id, text=params.get("text", ""))
+        elif method == "getupdates":
+            result = []
+        else:
+            # deleteMessage(s), setWebhook, deleteWebhook, answerCallbackQuery...
+            await self._delay()
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+    # ================= SERVIDOR =================
+    def make_app(self):
+        app = web.Application(client_max_size=200 * 1024 * 1024)
+        app.router.add_get("/toonbr/api/manga", self.toonbr_search)
+        app.router.add_get("/toonbr/api/manga/{slug}", self.toonbr_manga)
+        app.router.add_get("/toonbr/api/chapter/{chapter_id}", self.toonbr_chapter)
+        app.router.add_get("/toonbr-cdn/{chapter_id}/{page}.jpg", self.cdn_image)
+        app.router.add_get("/mangaflix/v1/search/mangas", self.mangaflix_search)
+        app.router.add_get("/mangaflix/v1/mangas/{manga_id}", self.mangaflix_manga)
+        app.router.add_get("/mangaflix/v1/chapters/{chapter_id}", self.mangaflix_chapter)
+        app.router.add_get("/mangaflix-cdn/{chapter_id}/{page}.jpg", self.cdn_image)
+        app.router.add_route("*", "/bot{token}/{method}", self.telegram)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.runner = web.AppRunner(self.make_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor falso das fontes e da Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def serve():
+        server = FakeServer(FakeConfig(latency=args.latency, error_rate=args.error_rate))
+        print("🧪 Servidor falso em", await server.start(port=args.port))
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench.fake_server import FakeConfig, FakeServer  # noqa: E402
+
+# roda os caminhos reais do bot (buscar, send_chapter, create_cbz,
+# queue_manager e worker) contra o servidor falso e grava os resultados
+# em JSON para comparar uma execução com a outra:
+#
+#   python -m bench.run --chapters 20 --pages 40 --compare bench/results/anterior.json
+
+TOKEN = "123456:BENCH"
+CHAT_ID = 1000
+
+
+# ================= MEDIÇÃO =================
+class Timings:
+
+    def __init__(self):
+        self.samples = {}
+
+    @asynccontextmanager
+    async def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        return {stage: summarize(values) for stage, values in self.samples.items()}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ================= CENÁRIOS =================
+def fake_update(bot, main, text, update_id):
+    from telegram import Update
+
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": main.AUTHORIZED_USERS[0], "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }, bot)
+
+
+async def bench_search(bot, main, timings, count):
+    for i in range(count):
+        query = f"bench {i}"
+        update = fake_update(bot, main, f"/bb {query}", i + 1)
+        context = SimpleNamespace(args=query.split(), bot=bot, chat_data={})
+        async with timings.measure("buscar"):
+            await main.buscar(update, context)
+
+
+async def bench_chapters(source, manga_id, count):
+    chapters = await source.chapters(manga_id)
+    return chapters[:count]
+
+
+async def bench_create_cbz(source, chapters, timings):
+    from utils.cbz import create_cbz
+
+    total = 0
+    for chapter in chapters:
+        imgs = await source.pages(chapter["url"])
+        async with timings.measure("create_cbz"):
+            parts, stats = await create_cbz(imgs, chapter["manga_title"], f"Cap_{chapter['chapter_number']}")
+        total += stats["bytes_out"]
+        for cbz_file, _ in parts:
+            cbz_file.close()
+    return total
+
+
+async def bench_send_chapter(bot, main, source, chapters, timings):
+    for chapter in chapters:
+        ctx = main.chapter_context(CHAT_ID, source, chapter)
+        async with timings.measure("send_chapter"):
+            async with timings.measure("stage.resolve"):
+                await main.resolve_chapter(ctx)
+            async with timings.measure("stage.build"):
+                await main.build_chapter(ctx)
+            async with timings.measure("stage.upload"):
+                await main.upload_chapter(bot, ctx)
+
+
+async def bench_workers(bot, main, source, chapters, chats, timings):
+    from utils import queue_manager
+
+    jobs = [
+        {"chat_id": CHAT_ID + 1 + i % chats, "source": source.name, "chapter": chapter}
+        for i, chapter in enumerate(chapters)
+    ]
+
+    start = time.perf_counter()
+    async with timings.measure("queue.add_jobs"):
+        await queue_manager.add_jobs(jobs)
+
+    workers = [
+        asyncio.create_task(main.worker(bot, number))
+        for number in range(1, main.DOWNLOAD_WORKERS + 1)
+    ]
+    try:
+        while queue_manager.pending_jobs():
+            await asyncio.sleep(0.05)
+    finally:
+        for task in workers:
+            task.cancel()
+
+    return time.perf_counter() - start
+
+
+# ================= EXECUÇÃO =================
+async def run(args):
+    server = FakeServer(FakeConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        page_size=args.page_size * 1024,
+        pages=args.pages,
+        chapters=args.chapters * 3,
+        upload_latency=args.upload_latency,
+    ))
+    base_url = await server.start()
+
+    # as fontes apontam para o servidor falso
+    from sources.toonbr import ToonBrSource
+    from sources.mangaflix import MangaFlixSource
+
+    ToonBrSource.api_url = f"{base_url}/toonbr"
+    ToonBrSource.cdn_url = f"{base_url}/toonbr-cdn"
+    MangaFlixSource.api_url = f"{base_url}/mangaflix/v1"
+
+    import main
+    from telegram.ext import ExtBot
+    from utils.rate_limiter import TelegramRateLimiter
+    from utils.http import close_clients
+    from utils.loader import get_all_sources
+
+    # AniList e tradutor ficam fora do benchmark: nada sai para a rede
+    async def no_prefetch(titles):
+        pass
+
+    main.prefetch_anilist = no_prefetch
+
+    bot = ExtBot(
+        TOKEN,
+        base_url=f"{base_url}/bot",
+        base_file_url=f"{base_url}/file/bot",
+        rate_limiter=TelegramRateLimiter(),
+    )
+    await bot.initialize()
+
+    timings = Timings()
+    sources = list(get_all_sources().values())
+    source = next(s for s in sources if s.name == args.source)
+
+    try:
+        await bench_search(bot, main, timings, args.searches)
+
+        chapters = await bench_chapters(source, "bench-1", args.chapters * 3)
+        cbz_chapters = chapters[:args.chapters]
+        send_chapters = chapters[args.chapters:args.chapters * 2]
+        worker_chapters = chapters[args.chapters * 2:]
+
+        start = time.perf_counter()
+        cbz_bytes = await bench_create_cbz(source, cbz_chapters, timings)
+        cbz_elapsed = time.perf_counter() - start
+
+        uploaded_before = server.stats["upload_bytes"]
+        start = time.perf_counter()
+        await bench_send_chapter(bot, main, source, send_chapters, timings)
+        send_elapsed = time.perf_counter() - start
+        send_bytes = server.stats["upload_bytes"] - uploaded_before
+
+        uploaded_before = server.stats["upload_bytes"]
+        worker_elapsed = await bench_workers(bot, main, source, worker_chapters, args.chats, timings)
+        worker_bytes = server.stats["upload_bytes"] - uploaded_before
+    finally:
+        await bot.shutdown()
+        await close_clients()
+        await server.stop()
+
+    def throughput(count, elapsed, size):
+        return {
+            "chapters": count,
+            "seconds": elapsed,
+            "chapters_per_min": count / elapsed * 60 if elapsed else 0,
+            "mb_per_s": size / 1024 / 1024 / elapsed if elapsed else 0,
+        }
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "stages": timings.summary(),
+        "throughput": {
+            "create_cbz": throughput(len(cbz_chapters), cbz_elapsed, cbz_bytes),
+            "send_chapter": throughput(len(send_chapters), send_elapsed, send_bytes),
+            "workers": throughput(len(worker_chapters), worker_elapsed, worker_bytes),
+        },
+        "server": server.stats,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ================= RELATÓRIO =================
+def report(results, previous=None):
+    def delta(current, old):
+        if not old:
+            return ""
+        return f"  ({(current - old) / old * 100:+.1f}%)"
+
+    print(f"\n{'estágio':<20}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in sorted(results["stages"].items()):
+        old = (previous or {}).get("stages", {}).get(stage, {})
+        print(
+            f"{stage:<20}{stats['count']:>5}"
+            f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}"
+            + delta(stats["p95"], old.get("p95"))
+        )
+
+    print()
+    for name, stats in results["throughput"].items():
+        old = (previous or {}).get("throughput", {}).get(name, {})
+        print(
+            f"{name:<20}{stats['chapters_per_min']:>8.1f} caps/min"
+            f"{stats['mb_per_s']:>8.2f} MB/s"
+            + delta(stats["chapters_per_min"], old.get("chapters_per_min"))
+        )
+
+    print(f"\npico de RSS: {results['peak_rss_mb']:.1f} MB"
+          + delta(results["peak_rss_mb"], (previous or {}).get("peak_rss_mb")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do bot")
+    parser.add_argument("--source", default="ToonBr", choices=["ToonBr", "MangaFlix"])
+    parser.add_argument("--searches", type=int, default=10)
+    parser.add_argument("--chapters", type=int, default=10, help="capítulos por cenário")
+    parser.add_argument("--chats", type=int, default=3, help="chats no cenário dos workers")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--page-size", type=int, default=300, help="KB por página")
+    parser.add_argument("--latency", type=float, default=0.05, help="segundos")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--upload-latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    # caches e fila do benchmark ficam num diretório temporário
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ.setdefault("BOT_TOKEN", TOKEN)
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = asyncio.run(run(args))
+
+    output = Path(args.output or ROOT / "bench" / "results" / f"bench-{int(time.time())}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    previous = json.loads(Path(args.compare).read_text()) if args.compare else None
+    report(results, previous)
+    print(f"\nresultados em {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench.fake_server import FakeConfig, FakeServer  # noqa: E402
+
+# sobe o modo webhook contra o servidor falso, entrega um update assinado
+# e um sem segredo, e mede o tempo até o handler rodar:
+#
+#   python -m bench.webhook_check
+
+TOKEN = "123456:BENCH"
+SECRET = "bench-secret"
+
+
+async def run():
+    server = FakeServer(FakeConfig(latency=0.01, jitter=0.0))
+    base_url = await server.start()
+
+    import aiohttp
+    from telegram.ext import ApplicationBuilder, MessageHandler, filters
+    from utils import webhook
+
+    port = int(os.environ["WEBHOOK_PORT"])
+
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"{base_url}/bot")
+        .updater(None)
+        .concurrent_updates(True)
+        .build()
+    )
+
+    handled = asyncio.Event()
+
+    async def on_message(update, context):
+        handled.set()
+
+    app.add_handler(MessageHandler(filters.ALL, on_message))
+
+    stop = asyncio.Event()
+    task = asyncio.create_task(webhook.serve_webhook(app, stop))
+
+    url = f"http://127.0.0.1:{port}{webhook.WEBHOOK_PATH}"
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "text": "oi",
+        },
+    }
+
+    async with aiohttp.ClientSession() as session:
+        for _ in range(50):
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/healthz") as r:
+                    if r.status == 200:
+                        break
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.05)
+
+        async with session.post(url, json=update) as r:
+            assert r.status == 403, r.status
+
+        start = time.perf_counter()
+        headers = {webhook.SECRET_HEADER: SECRET}
+        async with session.post(url, json=update, headers=headers) as r:
+            assert r.status == 200, r.status
+            ack = time.perf_counter() - start
+
+        await asyncio.wait_for(handled.wait(), 5)
+        done = time.perf_counter() - start
+
+    stop.set()
+    await task
+    await server.stop()
+
+    print(f"ack: {ack * 1000:.1f} ms  handler: {done * 1000:.1f} ms")
+    print(f"requisições à Bot API: {server.stats['telegram_requests']}")
+
+
+def main():
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("WEBHOOK_PORT", "18443")
+    os.environ["WEBHOOK_SECRET"] = SECRET
+    os.environ.setdefault("WEBHOOK_URL", "https://bench.invalid")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,203 @@
 import os
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+
+# ================= HTTP =================
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# ================= BUSCA =================
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "15"))
+SEARCH_RESULTS_PER_SOURCE = int(os.getenv("SEARCH_RESULTS_PER_SOURCE", "5"))
+# resultados compartilhados entre chats por (fonte, busca normalizada)
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "500"))
+
+# ================= SESSÕES =================
+# estado de cada chat (resultados da busca, lista de capítulos, mensagens)
+SESSION_MAX_CHATS = int(os.getenv("SESSION_MAX_CHATS", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(6 * 3600)))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+# bots só apagam mensagens com menos de 48h; a margem evita pedidos que falhariam
+MESSAGE_DELETE_WINDOW = float(os.getenv("MESSAGE_DELETE_WINDOW", str(47 * 3600)))
+# deletes individuais simultâneos quando o deleteMessages em lote falha
+CLEANUP_CONCURRENCY = int(os.getenv("CLEANUP_CONCURRENCY", "5"))
+
+# ================= SAÚDE DAS FONTES =================
+# chamadas recentes usadas para latência e taxa de erro
+SOURCE_HEALTH_WINDOW = int(os.getenv("SOURCE_HEALTH_WINDOW", "50"))
+# falhas seguidas que abrem o circuito da fonte
+SOURCE_BREAKER_THRESHOLD = int(os.getenv("SOURCE_BREAKER_THRESHOLD", "5"))
+# espera antes da chamada de teste; dobra a cada teste que falha
+SOURCE_BREAKER_COOLDOWN = float(os.getenv("SOURCE_BREAKER_COOLDOWN", "30"))
+SOURCE_BREAKER_MAX_COOLDOWN = float(os.getenv("SOURCE_BREAKER_MAX_COOLDOWN", "600"))
+# timeout = p99 das chamadas bem-sucedidas x fator, dentro destes limites
+SOURCE_TIMEOUT_FACTOR = float(os.getenv("SOURCE_TIMEOUT_FACTOR", "3"))
+SOURCE_TIMEOUT_MIN = float(os.getenv("SOURCE_TIMEOUT_MIN", "5"))
+SOURCE_TIMEOUT_MAX = float(os.getenv("SOURCE_TIMEOUT_MAX", "60"))
+SOURCE_TIMEOUT_MIN_SAMPLES = int(os.getenv("SOURCE_TIMEOUT_MIN_SAMPLES", "10"))
+
+# ================= ESPELHOS =================
+# capítulo que falha numa fonte é buscado no mesmo mangá em outra
+MIRROR_FAILOVER = os.getenv("MIRROR_FAILOVER", "1") == "1"
+# acima desta taxa de erro da fonte principal, as duas são consultadas juntas
+MIRROR_RACE_ERROR_RATE = float(os.getenv("MIRROR_RACE_ERROR_RATE", "0.3"))
+MIRROR_INDEX_TTL = float(os.getenv("MIRROR_INDEX_TTL", "86400"))
+MIRROR_INDEX_SIZE = int(os.getenv("MIRROR_INDEX_SIZE", "1000"))
+
+# ================= CACHE =================
+DATA_DIR = os.getenv("DATA_DIR", ".")
+FILE_CACHE_DB = os.path.join(DATA_DIR, "file_cache.db")
+# por quanto tempo um file_id é reenviado sem consultar a lista de páginas
+FILE_CACHE_TRUST_SECONDS = float(os.getenv("FILE_CACHE_TRUST_SECONDS", "86400"))
+
+# ================= PÁGINAS =================
+# imagens baixadas ficam em disco por URL e por sha256: capítulos
+# interrompidos continuam de onde pararam e imagens repetidas são
+# guardadas uma vez só
+PAGE_STORE = os.getenv("PAGE_STORE", "1") == "1"
+PAGE_STORE_DIR = os.path.join(DATA_DIR, "pages")
+PAGE_STORE_DB = os.path.join(DATA_DIR, "page_store.db")
+PAGE_STORE_MAX_BYTES = int(os.getenv("PAGE_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# ================= CBZ =================
+# acima deste tamanho o CBZ em construção vai para um arquivo temporário
+CBZ_SPOOL_MAX_SIZE = int(os.getenv("CBZ_SPOOL_MAX_SIZE", str(8 * 1024 * 1024)))
+# quantas páginas podem estar baixadas e ainda não gravadas no CBZ
+CBZ_DOWNLOAD_WINDOW = int(os.getenv("CBZ_DOWNLOAD_WINDOW", "8"))
+# limite de upload de bots é 50 MB; acima disso o capítulo é dividido em partes
+CBZ_MAX_PART_SIZE = int(os.getenv("CBZ_MAX_PART_SIZE", str(49 * 1024 * 1024)))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "5"))
+
+# ================= IMAGENS =================
+# recodifica as páginas (Pillow) num pool de processos antes de zipar
+IMAGE_OPTIMIZE = os.getenv("IMAGE_OPTIMIZE", "0") == "1"
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 2)))
+# 0 mantém a largura original
+IMAGE_TARGET_WIDTH = int(os.getenv("IMAGE_TARGET_WIDTH", "1200"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# ================= EXECUTORES =================
+# pools para o trabalho que travaria o event loop. Cada um aceita
+# EXECUTOR_<NOME>_KIND (thread/process), _WORKERS e _LIMIT (tarefas
+# enviadas ao mesmo tempo; as demais esperam sem ocupar o pool)
+def _executor(name, kind, workers):
+    prefix = f"EXECUTOR_{name.upper()}_"
+    workers = int(os.getenv(prefix + "WORKERS", str(workers)))
+    return {
+        "kind": os.getenv(prefix + "KIND", kind),
+        "workers": workers,
+        "limit": int(os.getenv(prefix + "LIMIT", str(workers * 2))),
+    }
+
+
+EXECUTORS = {
+    # recodificação de imagens (Pillow)
+    "images": _executor("images", "process", IMAGE_WORKERS),
+    # gravação dos CBZ: o crc32 solta o GIL, então capítulos diferentes usam núcleos diferentes
+    "zip": _executor("zip", "thread", min(4, os.cpu_count() or 2)),
+    # HTML e JSON grandes das fontes
+    "parse": _executor("parse", "thread", 2),
+    # leitura e gravação de arquivos (uploads, caches em JSON)
+    "io": _executor("io", "thread", 4),
+}
+# respostas JSON menores que isso são decodificadas no próprio loop
+PARSE_OFFLOAD_BYTES = int(os.getenv("PARSE_OFFLOAD_BYTES", str(64 * 1024)))
+
+# ================= DOWNLOAD DE PÁGINAS =================
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "60"))
+DOWNLOAD_HOST_CONCURRENCY = int(os.getenv("DOWNLOAD_HOST_CONCURRENCY", "4"))
+DOWNLOAD_HOST_MIN_CONCURRENCY = int(os.getenv("DOWNLOAD_HOST_MIN_CONCURRENCY", "1"))
+DOWNLOAD_HOST_MAX_CONCURRENCY = int(os.getenv("DOWNLOAD_HOST_MAX_CONCURRENCY", "10"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "4"))
+DOWNLOAD_BACKOFF_BASE = float(os.getenv("DOWNLOAD_BACKOFF_BASE", "1"))
+DOWNLOAD_BACKOFF_MAX = float(os.getenv("DOWNLOAD_BACKOFF_MAX", "30"))
+
+# ================= FILA =================
+QUEUE_DB = os.path.join(DATA_DIR, "queue.db")
+# jobs concluídos ficam no histórico por este tempo
+QUEUE_HISTORY_SECONDS = float(os.getenv("QUEUE_HISTORY_SECONDS", str(7 * 86400)))
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "3"))
+# capítulos de um mesmo chat que um worker pega de uma vez e processa em pipeline
+PIPELINE_BATCH = int(os.getenv("PIPELINE_BATCH", "5"))
+# itens que podem esperar entre um estágio e o próximo
+PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", "1"))
+# "inline": workers no mesmo processo do bot; "external": o bot só grava
+# os jobs e processos separados (python worker.py) os consomem do QUEUE_DB
+WORKER_MODE = os.getenv("WORKER_MODE", "inline")
+# total de processos worker.py (somando todas as máquinas): o bot e cada
+# worker dividem os limites da Bot API por esse número + 1
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+# um job sem heartbeat por este tempo volta para a fila
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "20"))
+# entregas de um job antes de desistir dele
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+BROKER_POLL_INTERVAL = float(os.getenv("BROKER_POLL_INTERVAL", "1"))
+
+# ================= ANILIST =================
+ANILIST_CACHE_FILE = os.path.join(DATA_DIR, "anilist_cache.json")
+ANILIST_CACHE_TTL = float(os.getenv("ANILIST_CACHE_TTL", str(7 * 86400)))
+ANILIST_CACHE_SIZE = int(os.getenv("ANILIST_CACHE_SIZE", "2000"))
+
+# ================= TRADUÇÃO =================
+TRANSLATION_CACHE_FILE = os.path.join(DATA_DIR, "translation_cache.json")
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", str(30 * 86400)))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2000"))
+# textos pedidos dentro desta janela vão juntos numa só requisição
+TRANSLATE_BATCH_WINDOW = float(os.getenv("TRANSLATE_BATCH_WINDOW", "0.05"))
+TRANSLATE_BATCH_CHARS = int(os.getenv("TRANSLATE_BATCH_CHARS", "4500"))
+
+# ================= CAPÍTULOS =================
+CHAPTER_CACHE_FILE = os.path.join(DATA_DIR, "chapter_cache.json")
+# lista considerada atual sem revalidar
+CHAPTER_CACHE_TTL = float(os.getenv("CHAPTER_CACHE_TTL", "600"))
+# por quanto tempo uma lista antiga é guardada para revalidação
+CHAPTER_CACHE_MAX_AGE = float(os.getenv("CHAPTER_CACHE_MAX_AGE", str(7 * 86400)))
+CHAPTER_CACHE_SIZE = int(os.getenv("CHAPTER_CACHE_SIZE", "300"))
+
+# ================= MÉTRICAS =================
+# endpoint Prometheus em http://METRICS_HOST:METRICS_PORT/metrics (0 desliga).
+# No WORKER_MODE=external os contadores de envio ficam nos workers: o
+# processo N de worker.py serve os dele em METRICS_PORT + N
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# ================= TELEGRAM =================
+# limites da Bot API: ~30 msgs/s no total, ~1/s por chat privado, 20/min por grupo
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+# rajada curta permitida por chat antes de cair na taxa acima
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+# fração da capacidade global que uploads em massa não podem usar
+TELEGRAM_INTERACTIVE_RESERVE = float(os.getenv("TELEGRAM_INTERACTIVE_RESERVE", "0.2"))
+# tokens da rajada de cada chat que só respostas interativas usam, para
+# edições de progresso e uploads não atrasarem o próximo /bb
+TELEGRAM_CHAT_RESERVE = float(os.getenv("TELEGRAM_CHAT_RESERVE", "1"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+
+# ================= MODO =================
+# "polling" (padrão) ou "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# URL base da Bot API; permite apontar para um servidor falso em testes
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+# URL pública que o Telegram chama (sem o caminho)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# tempo máximo para terminar os updates já recebidos ao desligar
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+
+# ================= DIAGNÓSTICO =================
+# intervalo do sleep que mede o atraso do event loop
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.5"))
+# acima disso o watchdog registra a pilha que está segurando o loop
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.5"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# ids separados por vírgula que podem usar /profile
+ADMIN_USERS = [int(i) for i in os.getenv("ADMIN_USERS", "").split(",") if i.strip()]
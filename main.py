@@ -1,6 +1,8 @@
 import os
+import time
 import asyncio
 import logging
+from functools import partial
 
 from telegram import (
     Update,
@@ -15,26 +17,62 @@ from telegram.ext import (
     ContextTypes,
 )
 
-from telegram.error import RetryAfter, TimedOut, NetworkError
+from telegram.error import TimedOut, NetworkError, BadRequest, TelegramError
+
+from config import (
+    SEARCH_RESULTS_PER_SOURCE,
+    DOWNLOAD_WORKERS,
+    PIPELINE_BATCH,
+    PIPELINE_DEPTH,
+    UPLOAD_RETRIES,
+    METRICS_HOST,
+    METRICS_PORT,
+    BOT_MODE,
+    TELEGRAM_API_URL,
+    WORKER_MODE,
+    WORKER_PROCESSES,
+    CLEANUP_CONCURRENCY,
+    MIRROR_FAILOVER,
+    PROFILE_MAX_SECONDS,
+    ADMIN_USERS,
+)
 
-from utils.loader import get_all_sources
+from utils.loader import get_all_sources, SourceUnavailable
+from utils import loader
+from utils import mirrors
 from utils.cbz import create_cbz
+from utils.scheduler import DownloadError
 from utils.queue_manager import (
     DOWNLOAD_QUEUE,
     add_job,
-    remove_job,
+    add_jobs,
+    ack_job,
+    restore_jobs,
     queue_size,
+    queue_chats,
 )
-from utils.anilist import search_anilist
+from utils import queue_manager
+from utils.anilist import search_anilist, prefetch_anilist
+from utils.cache import flush_all
+from utils.search import search_all, stats as search_stats
+from utils.pipeline import run_pipeline
+from utils.http import close_clients
+from utils.rate_limiter import TelegramRateLimiter, BULK
+from utils.webhook import serve_webhook
+from utils.session import SESSIONS
+from utils.tasks import run_in_background
+from utils import file_cache
+from utils import page_store
+from utils import profiler
+from utils import executors
+from utils import images
+from utils import metrics
+from utils import anilist, chapter_cache, translator
 
 logging.basicConfig(level=logging.INFO)
 
-DOWNLOAD_SEMAPHORE = asyncio.Semaphore(2)
 CHAPTERS_PER_PAGE = 10
 
-SEARCH_CACHE = {}
-BOT_MESSAGES = {}
-
 # =====================================================
 # USUÁRIOS AUTORIZADOS
 # =====================================================
@@ -61,74 +99,506 @@ def authorized_only(func):
     return wrapper
 
 
+def admin_only(func):
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
+        if update.effective_user.id not in ADMIN_USERS:
+            await update.message.reply_text("❌ Comando restrito a administradores.")
+            return
+        return await func(update, context, *args, **kwargs)
+    return wrapper
+
+
 # =====================================================
 # LIMPAR RASTROS DO BOT
 # =====================================================
-async def clean_bot_messages(chat_id, context):
-    msgs = BOT_MESSAGES.get(chat_id, [])
-    for mid in msgs:
+# deleteMessages aceita até 100 ids por chamada
+DELETE_BATCH = 100
+
+
+async def delete_one(bot, chat_id, message_id, semaphore):
+    async with semaphore:
         try:
-            await context.bot.delete_message(chat_id, mid)
-        except:
-            pass
-    BOT_MESSAGES[chat_id] = []
+            await bot.delete_message(
+                chat_id, message_id, rate_limit_args={"priority": BULK}
+            )
+        except TelegramError as e:
+            logging.debug("Mensagem %s não apagada: %s", message_id, e)
+
+
+async def delete_messages(bot, chat_id, message_ids):
+    semaphore = asyncio.Semaphore(CLEANUP_CONCURRENCY)
+    for start in range(0, len(message_ids), DELETE_BATCH):
+        batch = message_ids[start:start + DELETE_BATCH]
+        try:
+            await bot.delete_messages(
+                chat_id, batch, rate_limit_args={"priority": BULK}
+            )
+        except TelegramError as e:
+            # o lote inteiro falha se nenhuma puder ser apagada; uma a uma
+            # as que ainda existem saem
+            logging.debug("deleteMessages falhou (%s), apagando uma a uma", e)
+            await asyncio.gather(*(
+                delete_one(bot, chat_id, message_id, semaphore) for message_id in batch
+            ))
+
+
+# a busca não espera a limpeza
+def clean_bot_messages(chat_id, context):
+    session = SESSIONS.peek(chat_id)
+    if session is None:
+        return
+
+    message_ids = session.take_messages()
+    SESSIONS.update(chat_id)
+    if message_ids:
+        run_in_background(delete_messages(context.bot, chat_id, message_ids))
 
 
 def register_bot_message(chat_id, message):
-    BOT_MESSAGES.setdefault(chat_id, []).append(message.message_id)
+    SESSIONS.get(chat_id).add_message(message.message_id, message.date.timestamp())
+    SESSIONS.update(chat_id)
+
+
+async def session_expired(query):
+    await query.message.reply_text("⌛ Essa busca expirou. Use /bb de novo.")
 
 
 # =====================================================
 # ENVIO CAPÍTULO
 # =====================================================
-async def send_chapter(message, source, chapter):
-    async with DOWNLOAD_SEMAPHORE:
-        imgs = await source.pages(chapter["url"])
-        if not imgs:
-            return
+def read_document(document):
+    document.seek(0)
+    return document.read()
+
+
+async def upload_document(bot, chat_id, document, filename=None, caption=None):
+    # o PTB lê o arquivo inteiro de qualquer jeito, e um SpooledTemporaryFile
+    # ainda na memória não tem nome para ele adivinhar
+    if hasattr(document, "read"):
+        document = await executors.run("io", read_document, document)
+
+    # RetryAfter é tratado pelo TelegramRateLimiter
+    attempt = 0
+    while True:
+        try:
+            return await bot.send_document(
+                chat_id,
+                document,
+                filename=filename,
+                caption=caption,
+                rate_limit_args={"priority": BULK},
+            )
+        except BadRequest:
+            # 400 é determinístico (file_id morto, arquivo recusado): repetir
+            # não adianta. BadRequest é subclasse de NetworkError no PTB
+            raise
+        except (TimedOut, NetworkError):
+            attempt += 1
+            if attempt > UPLOAD_RETRIES:
+                raise
+            await asyncio.sleep(5)
+
+
+async def send_cached_chapter(bot, chat_id, source, chapter_id, file_ids, caption=None):
+    try:
+        for file_id in file_ids:
+            await upload_document(bot, chat_id, file_id, caption=caption)
+        return True
+    except BadRequest:
+        # file_id não é mais aceito pelo Telegram
+        file_cache.invalidate(source.name, chapter_id)
+        return False
+
+
+# estágios do envio: cada um recebe o contexto do capítulo e o completa
+def chapter_context(chat_id, source, chapter, job=None):
+    return {
+        "job": job,
+        "chat_id": chat_id,
+        "source": source,
+        "chapter": chapter,
+        "parts": [],
+    }
+
+
+async def resolve_chapter(ctx):
+    source = ctx["source"]
+    chapter_id = ctx["chapter"]["url"]
 
-        cbz_buffer, cbz_name = await create_cbz(
-            imgs,
+    # reenvio instantâneo de capítulos já entregues
+    ctx["file_ids"] = file_cache.get(source.name, chapter_id)
+    if ctx["file_ids"]:
+        return
+
+    with metrics.CHAPTER_STAGE_SECONDS.time(stage="pages"):
+        imgs = await source.pages(chapter_id)
+    if not imgs:
+        raise DownloadError(f"{source.name}: capítulo {chapter_id} sem páginas")
+
+    ctx["imgs"] = imgs
+    ctx["fingerprint"] = file_cache.pages_fingerprint(imgs)
+    ctx["file_ids"] = file_cache.get(source.name, chapter_id, ctx["fingerprint"])
+
+
+async def build_chapter(ctx):
+    # já montado por um espelho no estágio anterior
+    if ctx["file_ids"] or ctx["parts"]:
+        return
+
+    chapter = ctx["chapter"]
+    with metrics.CHAPTER_STAGE_SECONDS.time(stage="build"):
+        ctx["parts"], stats = await create_cbz(
+            ctx["imgs"],
             chapter.get("manga_title", "Manga"),
             f"Cap_{chapter.get('chapter_number')}",
         )
 
-        while True:
-            try:
-                await message.reply_document(cbz_buffer, filename=cbz_name)
-                break
-            except RetryAfter as e:
-                await asyncio.sleep(int(e.retry_after) + 2)
-            except (TimedOut, NetworkError):
-                await asyncio.sleep(5)
+    metrics.CHAPTER_STAGE_SECONDS.observe(stats["zip_time"], stage="zip")
+    images.record(stats)
+    logging.info(
+        "Cap %s: %d páginas, %.1f MB -> %.1f MB em %d partes, %.2fs de CPU",
+        chapter.get("chapter_number"),
+        stats["pages"],
+        stats["bytes_in"] / 1024 / 1024,
+        stats["bytes_out"] / 1024 / 1024,
+        len(ctx["parts"]),
+        stats["cpu_time"],
+    )
+
+
+def close_parts(ctx):
+    for cbz_file, _ in ctx["parts"]:
+        cbz_file.close()
+    ctx["parts"] = []
+
+
+def supplier_caption(ctx):
+    if not ctx.get("mirror_of"):
+        return None
+    return f"📡 Via {ctx['source'].name} ({ctx['mirror_of']} falhou)"
+
+
+def record_supplier(ctx):
+    metrics.CHAPTERS_SENT.inc(
+        source=ctx["source"].name, mirror="1" if ctx.get("mirror_of") else "0"
+    )
+
+
+async def upload_chapter(bot, ctx):
+    source = ctx["source"]
+    chapter_id = ctx["chapter"]["url"]
+    caption = supplier_caption(ctx)
+
+    if ctx["file_ids"]:
+        if await send_cached_chapter(
+            bot, ctx["chat_id"], source, chapter_id, ctx["file_ids"], caption
+        ):
+            record_supplier(ctx)
+            return
+        # file_id inválido: monta o capítulo de novo
+        await resolve_chapter(ctx)
+        await build_chapter(ctx)
+
+    file_ids = []
+    try:
+        with metrics.CHAPTER_STAGE_SECONDS.time(stage="upload"):
+            for cbz_file, cbz_name in ctx["parts"]:
+                sent = await upload_document(
+                    bot, ctx["chat_id"], cbz_file, filename=cbz_name, caption=caption
+                )
+                file_ids.append(sent.document.file_id)
+    finally:
+        close_parts(ctx)
+
+    file_cache.put(source.name, chapter_id, ctx["fingerprint"], file_ids)
+    page_store.release(ctx["imgs"])
+    record_supplier(ctx)
+
+
+# ================= ESPELHOS =================
+# o mesmo capítulo em outra fonte substitui o da principal quando ela
+# falha; com a principal instável, as duas são consultadas ao mesmo tempo
+def adopt(ctx, attempt):
+    if attempt["source"] is not ctx["source"]:
+        attempt["mirror_of"] = ctx["source"].name
+        logging.info(
+            "Cap %s veio de %s (espelho de %s)",
+            attempt["chapter"].get("chapter_number"),
+            attempt["source"].name,
+            ctx["source"].name,
+        )
+    ctx.update(attempt)
+
+
+def candidate_context(ctx, source, chapter):
+    return {**ctx, "source": source, "chapter": chapter, "parts": []}
+
+
+async def resolve_candidate(ctx, candidate):
+    attempt = candidate_context(ctx, *candidate)
+    await resolve_chapter(attempt)
+    return attempt
+
+
+async def failover(ctx, error):
+    if not MIRROR_FAILOVER or ctx.get("mirror_of"):
+        raise error
+
+    for source, chapter in await mirrors.find_mirrors(ctx["source"].name, ctx["chapter"]):
+        logging.warning(
+            "Cap %s: %s falhou (%s), tentando %s",
+            ctx["chapter"].get("chapter_number"), ctx["source"].name, error, source.name,
+        )
+        attempt = candidate_context(ctx, source, chapter)
+        try:
+            await resolve_chapter(attempt)
+            await build_chapter(attempt)
+        except Exception as e:
+            close_parts(attempt)
+            logging.warning("Espelho %s também falhou: %s", source.name, e)
+            continue
+        adopt(ctx, attempt)
+        return
+
+    raise error
+
+
+async def resolve_with_mirrors(ctx):
+    if MIRROR_FAILOVER and mirrors.degraded(ctx["source"]):
+        candidates = [(ctx["source"], ctx["chapter"])]
+        candidates += await mirrors.find_mirrors(ctx["source"].name, ctx["chapter"])
+        if len(candidates) > 1:
+            # se nenhuma responder, sobe o erro da principal
+            adopt(ctx, await mirrors.race(candidates, partial(resolve_candidate, ctx)))
+            return
+
+    try:
+        await resolve_chapter(ctx)
+    except Exception as error:
+        await failover(ctx, error)
+
+
+async def build_with_mirrors(ctx):
+    try:
+        await build_chapter(ctx)
+    except Exception as error:
+        close_parts(ctx)
+        await failover(ctx, error)
+
 
-        cbz_buffer.close()
+async def send_chapter(bot, chat_id, source, chapter):
+    ctx = chapter_context(chat_id, source, chapter)
+    await resolve_with_mirrors(ctx)
+    await build_with_mirrors(ctx)
+    await upload_chapter(bot, ctx)
 
 
 # =====================================================
 # WORKER
 # =====================================================
-async def worker():
-    print("✅ Worker iniciado")
-    while True:
-        job = await DOWNLOAD_QUEUE.get()
-        await send_chapter(
-            job["message"],
-            job["source"],
-            job["chapter"],
+async def finish_job(bot, ctx):
+    job = ctx["job"]
+    error = ctx.get("error")
+
+    if error is None:
+        try:
+            await upload_chapter(bot, ctx)
+        except Exception as e:
+            error = e
+    else:
+        close_parts(ctx)
+
+    if error is None:
+        ack_job(job, "done")
+        ctx["acked"] = True
+        metrics.JOBS_FINISHED.inc(status="done")
+        await update_progress(bot, ctx)
+        return
+
+    ack_job(job, "failed")
+    ctx["acked"] = True
+    metrics.JOBS_FINISHED.inc(status="failed")
+    await update_progress(bot, ctx, failed=True)
+    if isinstance(error, SourceUnavailable):
+        logging.warning("Capítulo não enviado: %s", error)
+        await notify_failure(bot, ctx, f"{error}.")
+    elif isinstance(error, DownloadError):
+        logging.warning("Capítulo incompleto: %s", error)
+        await notify_failure(bot, ctx, "algumas páginas não puderam ser baixadas.")
+    else:
+        logging.error("Erro ao enviar capítulo", exc_info=error)
+
+
+# o job já foi confirmado: se o chat não aceitar o aviso (bot bloqueado),
+# o lote segue
+async def notify_failure(bot, ctx, reason):
+    try:
+        await bot.send_message(
+            ctx["chat_id"],
+            f"❌ Cap {ctx['chapter'].get('chapter_number')} não foi enviado: {reason}",
+        )
+    except TelegramError as e:
+        logging.warning("Não foi possível avisar o chat %s: %s", ctx["chat_id"], e)
+
+
+def job_context(job, progress=None):
+    metrics.JOB_WAIT_SECONDS.observe(time.time() - job.get("created_at", time.time()))
+    ctx = chapter_context(
+        job["chat_id"],
+        get_all_sources()[job["source"]],
+        job["chapter"],
+        job,
+    )
+    ctx["progress"] = progress
+    return ctx
+
+
+# ================= PROGRESSO =================
+# mensagem com o andamento do lote, apagada quando ele termina; é como os
+# workers em outro processo avisam o chat que pediu os capítulos
+def progress_text(progress):
+    first = progress["jobs"][0]["chapter"].get("chapter_number")
+    last = progress["jobs"][-1]["chapter"].get("chapter_number")
+    chapters = f"Cap {first}" if first == last else f"Caps {first}–{last}"
+    text = f"⏳ {chapters}: {progress['done']}/{len(progress['jobs'])} enviados"
+    if progress["failed"]:
+        text += f", {progress['failed']} com erro"
+    if progress["queued"]:
+        text += f" · {progress['queued']} na fila depois destes"
+    return text
+
+
+async def start_progress(bot, jobs):
+    chat_id = jobs[0]["chat_id"]
+    progress = {
+        "jobs": jobs,
+        "done": 0,
+        "failed": 0,
+        "queued": max(queue_manager.pending_jobs(chat_id) - len(jobs), 0),
+        "message": None,
+    }
+    try:
+        progress["message"] = await bot.send_message(
+            chat_id, progress_text(progress), rate_limit_args={"priority": BULK}
         )
-        await asyncio.sleep(2)
-        remove_job()
-        DOWNLOAD_QUEUE.task_done()
+    except TelegramError as e:
+        logging.warning("Não foi possível avisar o chat %s: %s", chat_id, e)
+    return progress
+
+
+async def update_progress(bot, ctx, failed=False):
+    progress = ctx.get("progress")
+    if progress is None:
+        return
+
+    progress["failed" if failed else "done"] += 1
+    if progress["message"] is None:
+        return
+    message = progress["message"]
+    try:
+        await bot.edit_message_text(
+            progress_text(progress),
+            chat_id=message.chat_id,
+            message_id=message.message_id,
+            rate_limit_args={"priority": BULK},
+        )
+    except TelegramError:
+        pass
+
+
+async def end_progress(bot, progress):
+    if progress is None or progress["message"] is None:
+        return
+    message = progress["message"]
+    try:
+        await bot.delete_message(
+            message.chat_id, message.message_id, rate_limit_args={"priority": BULK}
+        )
+    except TelegramError:
+        pass
+
+
+# enquanto o capítulo N é enviado, o N+1 já está sendo baixado
+async def process_jobs(bot, jobs, report_progress=False):
+    progress = await start_progress(bot, jobs) if report_progress else None
+
+    contexts = []
+    for job in jobs:
+        try:
+            contexts.append(job_context(job, progress))
+        except KeyError:
+            logging.error("Job %s: fonte desconhecida %s", job["id"], job["source"])
+            ack_job(job, "failed")
+            metrics.JOBS_FINISHED.inc(status="failed")
+
+    try:
+        await run_pipeline(
+            contexts,
+            [resolve_with_mirrors, build_with_mirrors],
+            partial(finish_job, bot),
+            depth=PIPELINE_DEPTH,
+        )
+    except Exception:
+        logging.exception("Erro no lote de capítulos")
+    finally:
+        # partes montadas de capítulos que não chegaram ao envio
+        for ctx in contexts:
+            close_parts(ctx)
+        await end_progress(bot, progress)
+
+    # o que não foi confirmado vira falha; num cancelamento (desligamento)
+    # não chega aqui e os jobs ficam pendentes para o restore
+    for ctx in contexts:
+        if not ctx.get("acked"):
+            ack_job(ctx["job"], "failed")
+            metrics.JOBS_FINISHED.inc(status="failed")
+
+
+async def worker(bot, number):
+    print(f"✅ Worker {number} iniciado")
+    while True:
+        jobs = await DOWNLOAD_QUEUE.get_batch(PIPELINE_BATCH)
+        try:
+            await process_jobs(bot, jobs)
+        except Exception:
+            logging.exception("Erro no worker %s", number)
+        finally:
+            DOWNLOAD_QUEUE.task_done(jobs[0]["chat_id"])
 
 
 # =====================================================
 # BUSCAR (AGORA /BB)
 # =====================================================
+def search_status_text(buttons, pending, failed):
+    if buttons:
+        text = "📚 Escolha o mangá:"
+    elif pending:
+        text = "🔎 Buscando..."
+    else:
+        text = "❌ Nenhum resultado encontrado."
+
+    if pending:
+        text += "\n\n⏳ Aguardando: " + ", ".join(pending)
+    if failed:
+        text += "\n⚠️ Sem resposta: " + ", ".join(failed)
+    return text
+
+
+async def edit_search_message(msg, buttons, pending, failed):
+    try:
+        await msg.edit_text(
+            search_status_text(buttons, pending, failed),
+            reply_markup=InlineKeyboardMarkup(buttons) if buttons else None,
+        )
+    except BadRequest:
+        # "message is not modified"
+        pass
+
+
 @authorized_only
 async def buscar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    await clean_bot_messages(chat_id, context)
+    clean_bot_messages(chat_id, context)
 
     query = " ".join(context.args)
     if not query:
@@ -140,34 +610,40 @@ async def buscar(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     buttons = []
     cache = []
+    pending = list(get_all_sources())
+    failed = []
 
-    for source_name, source in get_all_sources().items():
-        try:
-            results = await source.search(query)
-            for manga in results[:5]:
-                cache.append({
-                    "source": source_name,
-                    "title": manga["title"],
-                    "url": manga["url"],
-                })
-                buttons.append([
-                    InlineKeyboardButton(
-                        f"{manga['title']} ({source_name})",
-                        callback_data=f"select|{len(cache)-1}",
-                    )
-                ])
-        except:
-            pass
-
-    if not buttons:
-        await msg.edit_text("❌ Nenhum resultado encontrado.")
-        return
+    # os botões já enviados apontam para esta lista
+    session = SESSIONS.get(chat_id)
+    session.set_results(cache)
 
-    SEARCH_CACHE[chat_id] = cache
-    await msg.edit_text(
-        "📚 Escolha o mangá:",
-        reply_markup=InlineKeyboardMarkup(buttons),
-    )
+    async for source_name, results, error in search_all(query):
+        pending.remove(source_name)
+        if error:
+            failed.append(f"{source_name} ({error})")
+
+        for manga in results[:SEARCH_RESULTS_PER_SOURCE]:
+            # referência ao resultado do cache global de buscas
+            cache.append((source_name, manga))
+            buttons.append([
+                InlineKeyboardButton(
+                    f"{manga['title']} ({source_name})",
+                    callback_data=f"select|{len(cache)-1}",
+                )
+            ])
+
+        SESSIONS.update(chat_id)
+        if not buttons and pending:
+            continue
+
+        await edit_search_message(msg, buttons, pending, failed)
+
+    session.set_results(tuple(cache))
+    SESSIONS.update(chat_id)
+
+    # sinopses e capas dos resultados numa só consulta ao AniList
+    if cache:
+        run_in_background(prefetch_anilist([manga["title"] for _, manga in cache]))
 
 
 # =====================================================
@@ -179,14 +655,28 @@ async def select_manga(update, context):
     await query.answer()
 
     chat_id = query.message.chat_id
-    data = SEARCH_CACHE[chat_id][int(query.data.split("|")[1])]
-    source = get_all_sources()[data["source"]]
+    session = SESSIONS.peek(chat_id)
+    index = int(query.data.split("|")[1])
+    if session is None or index >= len(session.results):
+        await session_expired(query)
+        return
+
+    source_name, manga = session.results[index]
+    source = get_all_sources()[source_name]
 
-    info = await search_anilist(data["title"])
-    chapters = await source.chapters(data["url"])
+    info = await search_anilist(manga["title"])
+    try:
+        chapters = await source.chapters(manga["url"])
+    except SourceUnavailable as e:
+        await query.message.reply_text(f"⚠️ {e}. Tente de novo mais tarde.")
+        return
+    except Exception:
+        logging.exception("Erro ao listar capítulos (%s)", source_name)
+        await query.message.reply_text(f"⚠️ {source_name} não respondeu. Tente de novo mais tarde.")
+        return
 
-    context.chat_data["chapters"] = chapters
-    context.chat_data["source"] = source
+    session.set_chapters(source_name, chapters)
+    SESSIONS.update(chat_id)
 
     text = (
         f"📖 *{info['title']}*\n\n"
@@ -215,8 +705,13 @@ async def show_chapters(update, context):
     query = update.callback_query
     await query.answer()
 
+    session = SESSIONS.peek(query.message.chat_id)
+    if session is None:
+        await session_expired(query)
+        return
+
     page = int(query.data.split("|")[1])
-    chapters = context.chat_data["chapters"]
+    chapters = session.chapters
 
     start = page * CHAPTERS_PER_PAGE
     end = start + CHAPTERS_PER_PAGE
@@ -225,7 +720,7 @@ async def show_chapters(update, context):
     buttons = [
         [
             InlineKeyboardButton(
-                f"Cap {c.get('chapter_number')}",
+                f"Cap {c.chapter_number}",
                 callback_data=f"download_one|{start+i}",
             )
         ]
@@ -255,16 +750,19 @@ async def download_all(update, context):
     query = update.callback_query
     await query.answer()
 
-    chapters = context.chat_data["chapters"]
-    source = context.chat_data["source"]
+    session = SESSIONS.peek(query.message.chat_id)
+    if session is None or not session.source_name:
+        await session_expired(query)
+        return
 
-    for ch in chapters:
-        await add_job({
-            "message": query.message,
-            "source": source,
-            "chapter": ch,
-            "meta": {},
-        })
+    await add_jobs([
+        {
+            "chat_id": query.message.chat_id,
+            "source": session.source_name,
+            "chapter": ch.to_dict(),
+        }
+        for ch in session.chapters
+    ])
 
     await query.message.reply_text("✅ Todos capítulos adicionados à fila.")
 
@@ -274,15 +772,16 @@ async def download_one(update, context):
     query = update.callback_query
     await query.answer()
 
+    session = SESSIONS.peek(query.message.chat_id)
     index = int(query.data.split("|")[1])
-    ch = context.chat_data["chapters"][index]
-    source = context.chat_data["source"]
+    if session is None or index >= len(session.chapters):
+        await session_expired(query)
+        return
 
     await add_job({
-        "message": query.message,
-        "source": source,
-        "chapter": ch,
-        "meta": {},
+        "chat_id": query.message.chat_id,
+        "source": session.source_name,
+        "chapter": session.chapters[index].to_dict(),
     })
 
     await query.message.reply_text("✅ Capítulo adicionado à fila.")
@@ -291,20 +790,206 @@ async def download_one(update, context):
 # =====================================================
 # STATUS
 # =====================================================
+def image_status_text():
+    stats = images.STATS
+    if not stats["chapters"]:
+        return ""
+
+    saved = stats["bytes_in"] - stats["bytes_out"]
+    return (
+        f"\n🗜 Imagens: {saved / 1024 / 1024:.1f} MB economizados em "
+        f"{stats['chapters']} capítulos, {stats['cpu_time']:.1f}s de CPU"
+    )
+
+
+def metrics_status_text():
+    lines = []
+
+    stages = []
+    for stage in ("pages", "build", "zip", "upload"):
+        p50 = metrics.CHAPTER_STAGE_SECONDS.percentile(0.5, stage=stage)
+        p95 = metrics.CHAPTER_STAGE_SECONDS.percentile(0.95, stage=stage)
+        if p50 is not None:
+            stages.append(f"{stage} {p50:.1f}/{p95:.1f}s")
+    if stages:
+        lines.append("⏱ Estágios (p50/p95): " + ", ".join(stages))
+
+    loop = profiler.stats()
+    if loop["lag_p95"] is not None:
+        lines.append(
+            f"🌀 Event loop: atraso p95 {loop['lag_p95'] * 1000:.0f} ms, "
+            f"máx {loop['max_lag'] * 1000:.0f} ms, {loop['blocks']} travadas"
+        )
+
+    busy = [
+        f"{name} {stats['running']}+{stats['waiting']}"
+        for name, stats in executors.STATS.items()
+        if stats["running"] or stats["waiting"]
+    ]
+    if busy:
+        lines.append("🧵 Executores (rodando+esperando): " + ", ".join(busy))
+
+    wait = metrics.JOB_WAIT_SECONDS.percentile(0.95)
+    if wait is not None:
+        lines.append(f"🕒 Espera na fila (p95): {wait:.0f}s")
+
+    lines.append(
+        f"⚠️ Falhas de imagem: {metrics.PAGE_DOWNLOAD_ERRORS.total()}, "
+        f"RetryAfter: {metrics.TELEGRAM_RETRY_AFTER_SECONDS.total()}s, "
+        f"jobs com erro: {metrics.JOBS_FINISHED.get(status='failed')}"
+    )
+    return "\n" + "\n".join(lines)
+
+
+def source_status_text():
+    parts = []
+    for name, health in loader.health().items():
+        if health["state"] == "open":
+            state = f"fora (teste em {health['retry_in']:.0f}s)"
+        elif health["state"] == "half_open":
+            state = "testando"
+        else:
+            state = "ok"
+        if health["p95"] is not None:
+            state += f", p95 {health['p95']:.1f}s"
+        parts.append(f"{name} {state}, {health['error_rate']:.0%} erros")
+    return "\n🩺 Fontes: " + "; ".join(parts) + mirror_status_text()
+
+
+def mirror_status_text():
+    if not MIRROR_FAILOVER:
+        return ""
+    stats = mirrors.stats()
+    return (
+        f"\n🪞 Espelhos: {stats['found']} de {stats['lookups']} buscas acharam outra fonte "
+        f"({stats['size']} títulos no índice)"
+    )
+
+
+def page_store_status_text():
+    stats = page_store.stats()
+    if not stats["enabled"]:
+        return "\n💾 Páginas em disco: desligado"
+    return (
+        f"\n💾 Páginas em disco: {stats['bytes'] / 1024 / 1024:.0f} / "
+        f"{stats['max_bytes'] / 1024 / 1024:.0f} MB, {stats['hits']} reaproveitadas, "
+        f"{stats['deduplicated']} repetidas"
+    )
+
+
+def session_status_text():
+    stats = SESSIONS.stats()
+    return (
+        f"\n🧠 Sessões: {stats['chats']} chats, {stats['bytes'] / 1024:.0f} / "
+        f"{stats['max_bytes'] / 1024:.0f} KB ({stats['expired']} expiradas, "
+        f"{stats['evicted']} descartadas)"
+    )
+
+
+def workers_status_text():
+    if WORKER_MODE == "inline":
+        return f"{DOWNLOAD_WORKERS} workers"
+    text = f"{queue_manager.active_workers()} workers externos"
+    if METRICS_PORT:
+        # estágios, falhas e jobs concluídos são contados nos workers
+        text += f", métricas a partir da porta {METRICS_PORT + 1}"
+    return text
+
+
 @authorized_only
 async def status(update, context):
-    await update.message.reply_text(f"📦 Fila: {queue_size()}")
+    stats = file_cache.STATS
+    searches = search_stats()
+    await update.message.reply_text(
+        f"📦 Fila: {queue_size()} ({queue_chats()} chats, {workers_status_text()})\n"
+        f"🗂 Cache de arquivos: {stats['hits']} hits / {stats['misses']} misses "
+        f"({file_cache.size()} capítulos, {stats['invalidated']} invalidados)\n"
+        f"🔎 Cache de buscas: {searches['hits']} hits / {searches['misses']} misses "
+        f"({searches['size']} buscas)"
+        + source_status_text()
+        + page_store_status_text()
+        + session_status_text()
+        + image_status_text()
+        + metrics_status_text()
+    )
+
+
+# =====================================================
+# PERFIL
+# =====================================================
+@admin_only
+async def profile_command(update, context):
+    try:
+        seconds = float(context.args[0]) if context.args else 10
+    except ValueError:
+        await update.message.reply_text("❌ Use /profile <segundos>")
+        return
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+
+    await update.message.reply_text(f"🔬 Amostrando por {seconds:.0f}s...")
+    folded, samples = await profiler.profile(seconds)
+    await update.message.reply_document(
+        folded.encode(),
+        filename=f"profile-{int(time.time())}.folded",
+        caption=f"{samples} amostras em {seconds:.0f}s (flamegraph.pl ou speedscope.app)",
+    )
+
+
+# =====================================================
+# MÉTRICAS
+# =====================================================
+def cache_stats():
+    all_stats = {
+        "file": file_cache.STATS,
+        "pages": page_store.STATS,
+        "search": search_stats(),
+        "chapters": chapter_cache.stats(),
+        "anilist": anilist.stats(),
+        "translation": translator.stats(),
+    }
+    values = {}
+    for cache, stats in all_stats.items():
+        values[(("cache", cache), ("result", "hit"))] = stats["hits"]
+        values[(("cache", cache), ("result", "miss"))] = stats["misses"]
+    return values
+
+
+metrics.Gauge("download_queue_jobs", "Jobs esperando na fila", queue_size)
+metrics.Gauge("download_queue_chats", "Chats com jobs na fila", queue_chats)
+metrics.Gauge("oldest_job_age_seconds", "Idade do job pendente mais antigo", queue_manager.oldest_job_age)
+metrics.Gauge("cache_requests", "Consultas aos caches por resultado", cache_stats)
+metrics.Gauge("session_chats", "Chats com sessão em memória", lambda: len(SESSIONS))
+metrics.Gauge("session_bytes", "Memória estimada das sessões", SESSIONS.memory)
+metrics.Gauge("page_store_bytes", "Espaço usado pelas páginas em disco", page_store.size)
 
 
 # =====================================================
 # MAIN
 # =====================================================
+# processos que dividem os limites da Bot API com este
+def api_processes():
+    return WORKER_PROCESSES + 1 if WORKER_MODE == "external" else 1
+
+
 def main():
-    app = ApplicationBuilder().token(os.getenv("BOT_TOKEN")).build()
+    builder = (
+        ApplicationBuilder()
+        .token(os.getenv("BOT_TOKEN"))
+        .rate_limiter(TelegramRateLimiter(processes=api_processes()))
+    )
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL.rstrip("/") + "/bot")
+    if BOT_MODE == "webhook":
+        # o receptor próprio substitui o Updater; um clique não espera
+        # a busca de outro update terminar
+        builder = builder.updater(None).concurrent_updates(True)
+    app = builder.build()
 
     # Comandos
     app.add_handler(CommandHandler("bb", buscar))
     app.add_handler(CommandHandler("status", status))
+    # não bloqueia os outros updates enquanto amostra
+    app.add_handler(CommandHandler("profile", profile_command, block=False))
 
     # Callbacks
     app.add_handler(CallbackQueryHandler(select_manga, pattern="^select"))
@@ -312,13 +997,41 @@ def main():
     app.add_handler(CallbackQueryHandler(download_all, pattern="download_all"))
     app.add_handler(CallbackQueryHandler(download_one, pattern="download_one"))
 
+    monitor = profiler.LoopMonitor()
+
     async def startup(app):
-        asyncio.create_task(worker())
+        monitor.start()
+        if WORKER_MODE == "inline":
+            restored = restore_jobs()
+            if restored:
+                print(f"♻️ {restored} jobs restaurados da fila")
+            for number in range(1, DOWNLOAD_WORKERS + 1):
+                asyncio.create_task(worker(app.bot, number))
+        else:
+            # os jobs ficam no QUEUE_DB para os processos de worker.py
+            queue_manager.compact_jobs()
+            print(f"📦 {queue_manager.pending_jobs()} jobs pendentes para os workers externos")
+        if METRICS_PORT:
+            await metrics.start_server(METRICS_HOST, METRICS_PORT)
+
+    async def shutdown(app):
+        monitor.stop()
+        await metrics.stop_server()
+        await close_clients()
+        file_cache.close()
+        page_store.close()
+        queue_manager.close()
+        flush_all()
+        executors.shutdown()
 
     app.post_init = startup
+    app.post_shutdown = shutdown
 
     print("🤖 Biblioteca308 bot")
-    app.run_polling(drop_pending_updates=True)
+    if BOT_MODE == "webhook":
+        asyncio.run(serve_webhook(app))
+    else:
+        app.run_polling(drop_pending_updates=True)
 
 
 if __name__ == "__main__":
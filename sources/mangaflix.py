@@ -1,5 +1,9 @@
 import httpx
 
+from utils import http
+from utils import executors
+from utils.chapter_cache import cached_chapters
+
 
 class MangaFlixSource:
     name = "MangaFlix"
@@ -29,19 +33,16 @@ class MangaFlixSource:
             "selected_language": "pt-br"
         }
 
-        async with httpx.AsyncClient(
+        r = await http.get(
+            url,
+            params=params,
             headers=self.headers,
             timeout=self.timeout,
             http2=False  # força HTTP/1.1
-        ) as client:
-
-            r = await client.get(url, params=params)
-
-            if r.status_code != 200:
-                print("Search error:", r.status_code, r.text)
-                return []
+        )
 
-            data = r.json()
+        r.raise_for_status()
+        data = await executors.loads(r.content)
 
         results = []
 
@@ -57,20 +58,17 @@ class MangaFlixSource:
     async def chapters(self, manga_id: str):
         url = f"{self.api_url}/mangas/{manga_id}"
 
-        async with httpx.AsyncClient(
-            headers=self.headers,
-            timeout=self.timeout,
-            http2=False
-        ) as client:
-
-            r = await client.get(url)
-
-            if r.status_code != 200:
-                print("Chapters error:", r.status_code, r.text)
-                return []
+        async def request(headers):
+            return await http.get(
+                url,
+                headers={**self.headers, **headers},
+                timeout=self.timeout,
+                http2=False
+            )
 
-            data = r.json()
+        return await cached_chapters(self.name, manga_id, request, self.parse_chapters)
 
+    def parse_chapters(self, data):
         manga_data = data.get("data", {})
         manga_title = manga_data.get("name", "Manga")
 
@@ -94,19 +92,16 @@ class MangaFlixSource:
             "selected_language": "pt-br"
         }
 
-        async with httpx.AsyncClient(
+        r = await http.get(
+            url,
+            params=params,
             headers=self.headers,
             timeout=self.timeout,
             http2=False
-        ) as client:
-
-            r = await client.get(url, params=params)
-
-            if r.status_code != 200:
-                print("Pages error:", r.status_code, r.text)
-                return []
+        )
 
-            data = r.json()
+        r.raise_for_status()
+        data = await executors.loads(r.content)
 
         images = data.get("data", {}).get("images", [])
 
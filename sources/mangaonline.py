@@ -1,41 +1,82 @@
-import httpx
 from bs4 import BeautifulSoup
 
+from utils import http
+from utils import executors
+
 
 BASE_URL = "https://mangasonline.blog"
 
 
-class MangaOnlineSource:
+# ================= PARSE =================
+# o BeautifulSoup em páginas grandes leva dezenas de ms: roda no pool "parse"
+def parse_search(html):
+    soup = BeautifulSoup(html, "html.parser")
+    mangas = []
 
-    def __init__(self):
-        self.client = httpx.AsyncClient(
-            timeout=30,
-            headers={
-                "User-Agent": "Mozilla/5.0"
-            }
-        )
+    for item in soup.select(".c-tabs-item__content"):
+        title_tag = item.select_one(".post-title a")
+        if not title_tag:
+            continue
 
-    # ================= SEARCH =================
+        mangas.append({
+            "title": title_tag.text.strip(),
+            "url": title_tag["href"]
+        })
+
+    return mangas
 
-    async def search(self, query):
-        try:
-            url = f"{BASE_URL}/?s={query}&post_type=wp-manga"
-            r = await self.client.get(url)
 
-            soup = BeautifulSoup(r.text, "html.parser")
-            mangas = []
+def parse_chapters(html):
+    soup = BeautifulSoup(html, "html.parser")
 
-            for item in soup.select(".c-tabs-item__content"):
-                title_tag = item.select_one(".post-title a")
-                if not title_tag:
-                    continue
+    chapters = []
 
-                mangas.append({
-                    "title": title_tag.text.strip(),
-                    "url": title_tag["href"]
-                })
+    for ch in soup.select(".wp-manga-chapter a"):
+        chapters.append({
+            "name": ch.text.strip(),
+            "url": ch["href"]
+        })
 
-            return mangas
+    chapters.reverse()
+    return chapters
+
+
+def parse_pages(html):
+    soup = BeautifulSoup(html, "html.parser")
+
+    images = []
+
+    for img in soup.select(".reading-content img"):
+        src = img.get("data-src") or img.get("src")
+        if src:
+            images.append(src)
+
+    return images
+
+
+class MangaOnlineSource:
+    name = "MangaOnline"
+
+    timeout = 30
+    headers = {
+        "User-Agent": "Mozilla/5.0"
+    }
+
+    async def _get(self, url, **kwargs):
+        return await http.get(
+            url,
+            headers=self.headers,
+            timeout=self.timeout,
+            **kwargs
+        )
+
+    # ================= SEARCH =================
+
+    async def search(self, query):
+        try:
+            params = {"s": query, "post_type": "wp-manga"}
+            r = await self._get(f"{BASE_URL}/", params=params)
+            return await executors.run("parse", parse_search, r.text)
 
         except Exception:
             return []
@@ -44,19 +85,8 @@ class MangaOnlineSource:
 
     async def chapters(self, manga_url):
         try:
-            r = await self.client.get(manga_url)
-            soup = BeautifulSoup(r.text, "html.parser")
-
-            chapters = []
-
-            for ch in soup.select(".wp-manga-chapter a"):
-                chapters.append({
-                    "name": ch.text.strip(),
-                    "url": ch["href"]
-                })
-
-            chapters.reverse()
-            return chapters
+            r = await self._get(manga_url)
+            return await executors.run("parse", parse_chapters, r.text)
 
         except Exception:
             return []
@@ -65,17 +95,8 @@ class MangaOnlineSource:
 
     async def pages(self, chapter_url):
         try:
-            r = await self.client.get(chapter_url)
-            soup = BeautifulSoup(r.text, "html.parser")
-
-            images = []
-
-            for img in soup.select(".reading-content img"):
-                src = img.get("data-src") or img.get("src")
-                if src:
-                    images.append(src)
-
-            return images
+            r = await self._get(chapter_url)
+            return await executors.run("parse", parse_pages, r.text)
 
         except Exception:
             return []
@@ -1,5 +1,7 @@
-import httpx
-import asyncio
+from utils import http
+from utils import executors
+from utils.chapter_cache import cached_chapters
+
 
 class ToonBrSource:
     name = "ToonBr"
@@ -7,15 +9,14 @@ class ToonBrSource:
     api_url = "https://api.toonbr.com"
     cdn_url = "https://cdn2.toonbr.com"
 
+    timeout = 60
+
     async def search(self, query: str):
-        url = f"{self.api_url}/api/manga?page=1&limit=20&search={query}"
-        async with httpx.AsyncClient(timeout=60) as client:
-            try:
-                r = await client.get(url)
-                r.raise_for_status()
-                data = r.json()
-            except Exception:
-                return []
+        url = f"{self.api_url}/api/manga"
+        params = {"page": 1, "limit": 20, "search": query}
+        r = await http.get(url, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        data = await executors.loads(r.content)
 
         results = []
         for manga in data.get("data", []):
@@ -27,14 +28,20 @@ class ToonBrSource:
 
     async def chapters(self, manga_slug: str):
         url = f"{self.api_url}/api/manga/{manga_slug}"
-        async with httpx.AsyncClient(timeout=60) as client:
-            try:
-                r = await client.get(url)
-                r.raise_for_status()
-                data = r.json()
-            except Exception:
-                return []
 
+        async def request(headers):
+            return await http.get(url, headers=headers, timeout=self.timeout)
+
+        return await cached_chapters(self.name, manga_slug, request, self.parse_chapters)
+
+    @staticmethod
+    def _chapter_key(chapter):
+        try:
+            return float(chapter.get("chapter_number") or 0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def parse_chapters(self, data):
         chapters = []
         manga_title = data.get("title", "Manga")
         for ch in data.get("chapters", []):
@@ -45,18 +52,14 @@ class ToonBrSource:
                 "manga_title": manga_title,
             })
 
-        chapters.sort(key=lambda x: float(x.get("chapter_number") or 0), reverse=True)
+        chapters.sort(key=self._chapter_key, reverse=True)
         return chapters
 
     async def pages(self, chapter_id: str):
         url = f"{self.api_url}/api/chapter/{chapter_id}"
-        async with httpx.AsyncClient(timeout=60) as client:
-            try:
-                r = await client.get(url)
-                r.raise_for_status()
-                data = r.json()
-            except Exception:
-                return []
+        r = await http.get(url, timeout=self.timeout)
+        r.raise_for_status()
+        data = await executors.loads(r.content)
 
         pages = []
         for p in data.get("pages", []):
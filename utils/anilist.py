@@ -1,11 +1,14 @@
-import aiohttp
+import asyncio
 import re
+from functools import partial
 
-ANILIST_URL = "https://graphql.anilist.co"
-
-TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+from config import ANILIST_CACHE_FILE, ANILIST_CACHE_TTL, ANILIST_CACHE_SIZE
+from utils import http
+from utils.cache import TTLCache
+from utils.text import normalize
+from utils.translator import translate_to_pt
 
-_translation_cache = {}
+ANILIST_URL = "https://graphql.anilist.co"
 
 
 def clean_html(text):
@@ -23,62 +26,36 @@ def is_english(text):
     return any(word in text_lower for word in common_words)
 
 
-async def translate_to_pt(text):
-
-    if text in _translation_cache:
-        return _translation_cache[text]
-
-    params = {
-        "client": "gtx",
-        "sl": "en",
-        "tl": "pt",
-        "dt": "t",
-        "q": text,
+MEDIA_FIELDS = """
+    title {
+      romaji
+      english
+      native
     }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(TRANSLATE_URL, params=params) as resp:
-            result = await resp.json()
-
-    translated = "".join([item[0] for item in result[0]])
-
-    _translation_cache[text] = translated
-    return translated
-
-
-async def search_anilist(title):
-
-    query = """
-    query ($search: String) {
-      Media(search: $search, type: MANGA) {
-        title {
-          romaji
-          english
-          native
-        }
-        description(asHtml: false)
-        genres
-        coverImage {
-          extraLarge
-        }
-      }
+    description(asHtml: false)
+    genres
+    coverImage {
+      extraLarge
     }
-    """
+"""
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            ANILIST_URL,
-            json={"query": query, "variables": {"search": title}},
-        ) as resp:
-            data = await resp.json()
+# título normalizado -> dados prontos para o select_manga
+_metadata_cache = TTLCache(
+    ANILIST_CACHE_SIZE,
+    ANILIST_CACHE_TTL,
+    path=ANILIST_CACHE_FILE,
+)
 
-    media = data["data"]["Media"]
 
+async def _build_info(media):
     synopsis = clean_html(media.get("description", ""))
 
     if not synopsis:
         synopsis = "Sem sinopse disponível."
 
+    # resume antes de traduzir: só o que vai aparecer é enviado ao tradutor
+    synopsis = summarize(synopsis)
+
     # 🔥 FALLBACK AUTOMÁTICO
     if is_english(synopsis):
         try:
@@ -86,8 +63,6 @@ async def search_anilist(title):
         except:
             pass
 
-    synopsis = summarize(synopsis)
-
     return {
         "title": media["title"]["romaji"]
         or media["title"]["english"]
@@ -96,3 +71,81 @@ async def search_anilist(title):
         "cover": media["coverImage"]["extraLarge"],
         "synopsis": synopsis,
     }
+
+
+async def _fetch_anilist(title):
+    query = """
+    query ($search: String) {
+      Media(search: $search, type: MANGA) {%s}
+    }
+    """ % MEDIA_FIELDS
+
+    resp = await http.post(
+        ANILIST_URL,
+        json={"query": query, "variables": {"search": title}},
+    )
+    data = resp.json()
+
+    return await _build_info(data["data"]["Media"])
+
+
+async def search_anilist(title):
+    return await _metadata_cache.get_or_fetch(
+        normalize(title),
+        lambda: _fetch_anilist(title),
+    )
+
+
+# ================= LOTE =================
+# vários títulos numa única requisição GraphQL (um alias por título);
+# usado para aquecer o cache com os resultados da busca
+async def _fetch_anilist_many(titles, keys):
+    aliases = {f"m{i}": key for i, key in enumerate(keys)}
+    variables = ", ".join(f"$s_{alias}: String" for alias in aliases)
+    fields = "\n".join(
+        f"{alias}: Media(search: $s_{alias}, type: MANGA) {{{MEDIA_FIELDS}}}"
+        for alias in aliases
+    )
+
+    resp = await http.post(
+        ANILIST_URL,
+        json={
+            "query": f"query ({variables}) {{\n{fields}\n}}",
+            "variables": {
+                f"s_{alias}": titles[key] for alias, key in aliases.items()
+            },
+        },
+    )
+    data = resp.json().get("data") or {}
+
+    # as sinopses são traduzidas juntas num único lote
+    results = [(key, data.get(alias)) for alias, key in aliases.items()]
+    results = [(key, media) for key, media in results if media]
+    infos = await asyncio.gather(*(_build_info(media) for _, media in results))
+    return {key: info for (key, _), info in zip(results, infos)}
+
+
+async def search_anilist_many(titles):
+    keys = {title: normalize(title) for title in titles}
+    # um clique no select_manga durante o lote espera por ele em vez de
+    # gastar outra requisição do limite do AniList
+    found = await _metadata_cache.get_or_fetch_many(
+        list(dict.fromkeys(keys.values())),
+        partial(_fetch_anilist_many, {key: title for title, key in keys.items()}),
+    )
+    return {title: found[key] for title, key in keys.items() if key in found}
+
+
+async def prefetch_anilist(titles):
+    try:
+        await search_anilist_many(titles)
+    except Exception as e:
+        print("Erro ao pré-carregar AniList:", e)
+
+
+def stats():
+    return {
+        "hits": _metadata_cache.hits,
+        "misses": _metadata_cache.misses,
+        "size": len(_metadata_cache),
+    }
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils import executors
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# caches com arquivo, salvos juntos no desligamento
+_persistent = []
+
+
+# ================= TTL + LRU =================
+class TTLCache:
+
+    def __init__(self, maxsize, ttl, path=None, flush_every=50):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._dirty = 0
+        self._writing = None
+        self._write_lock = threading.Lock()
+
+        if path:
+            self._load()
+            _persistent.append(self)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (time.time() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+        self._dirty += 1
+        if self.path and self._dirty >= self.flush_every:
+            self._flush_later()
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    # chamadas simultâneas para a mesma chave esperam uma única busca
+    async def get_or_fetch(self, key, fetch):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        value = await asyncio.shield(task)
+        if value is _MISSING:
+            # um lote (get_or_fetch_many) não trouxe esta chave: busca sozinha
+            return await self.get_or_fetch(key, fetch)
+        return value
+
+    # várias chaves numa busca só; enquanto ela roda, as chaves ficam em
+    # andamento e um get_or_fetch de qualquer uma delas espera o lote
+    async def get_or_fetch_many(self, keys, fetch_many):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+            elif key not in self._inflight and key not in missing:
+                missing.append(key)
+
+        if not missing:
+            return found
+
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for key in missing:
+            future = futures[key] = loop.create_future()
+            self._inflight[key] = future
+            future.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+
+        try:
+            values = await fetch_many(missing)
+            for key, value in values.items():
+                self.set(key, value)
+                found[key] = value
+                futures[key].set_result(value)
+        finally:
+            # com erro, cancelamento ou chave sem resultado, quem esperava
+            # faz a própria busca
+            for future in futures.values():
+                if not future.done():
+                    future.set_result(_MISSING)
+
+        return found
+
+    async def _fill(self, key, fetch):
+        value = await fetch()
+        self.set(key, value)
+        return value
+
+    # ================= DISCO =================
+    def _snapshot(self):
+        now = time.time()
+        return [
+            [key, expires, value]
+            for key, (expires, value) in self._data.items()
+            if expires >= now
+        ]
+
+    def _write(self, entries):
+        # o lock evita que o flush do desligamento e um do pool escrevam o
+        # mesmo .tmp ao mesmo tempo; o pid no nome faz o mesmo entre os
+        # processos worker, que gravam os mesmos caches
+        with self._write_lock:
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+
+    def flush(self):
+        if not self.path or not self._dirty:
+            return
+
+        self._write(self._snapshot())
+        self._dirty = 0
+
+    # com o loop rodando, o json.dump vai para o pool "io"; se já houver
+    # uma gravação em andamento, a próxima fica para o próximo set
+    def _flush_later(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+
+        if self._writing is not None:
+            return
+
+        entries = self._snapshot()
+        dirty, self._dirty = self._dirty, 0
+        self._writing = asyncio.ensure_future(executors.run("io", self._write, entries))
+
+        def done(task):
+            self._writing = None
+            if not task.cancelled() and task.exception() is None:
+                return
+            # não gravou: o flush_all do desligamento tenta de novo
+            self._dirty += dirty
+            if not task.cancelled():
+                logger.warning("Erro ao salvar cache %s: %s", self.path, task.exception())
+
+        self._writing.add_done_callback(done)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+        for key, expires, value in entries[-self.maxsize:]:
+            if expires >= now:
+                # chaves compostas voltam do JSON como listas
+                key = tuple(key) if isinstance(key, list) else key
+                self._data[key] = (expires, value)
+
+
+def flush_all():
+    for cache in _persistent:
+        try:
+            cache.flush()
+        except OSError as e:
+            print(f"Erro ao salvar cache {cache.path}: {e}")
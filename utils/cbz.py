@@ -1,41 +1,133 @@
 import zipfile
-import httpx
 import asyncio
-from io import BytesIO
+import tempfile
+import time
+from collections import deque
 
+from config import CBZ_SPOOL_MAX_SIZE, CBZ_DOWNLOAD_WINDOW, CBZ_MAX_PART_SIZE
+from utils import executors
+from utils.images import optimize
+from utils.scheduler import DownloadError
+from utils.page_store import fetch_page
 
-async def download_image(client, url):
-    try:
-        r = await client.get(url, timeout=60)
-        r.raise_for_status()
-        return r.content
-    except Exception as e:
-        print(f"Erro ao baixar imagem: {e}")
-        return None
+
+# ================= FORMATOS =================
+def image_extension(data):
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"GIF8"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    return None
 
 
-async def create_cbz(image_urls, manga_title, chapter_name):
+def cbz_filename(manga_title, chapter_name):
     safe_title = manga_title.replace("/", "").replace(" ", "_")
     safe_chapter = str(chapter_name).replace("/", "").replace(" ", "_")
+    return f"{safe_title}_{safe_chapter}.cbz"
+
+
+# ================= WRITER =================
+class CbzWriter:
+
+    def __init__(self, max_memory=CBZ_SPOOL_MAX_SIZE):
+        # fica na memória até max_memory bytes, depois vai para o disco
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self.zip = zipfile.ZipFile(self.file, "w")
+        self.pages = 0
+
+    def size(self):
+        # dados já gravados + uma estimativa do diretório central
+        return self.file.tell() + 128 * self.pages
+
+    def add(self, img_bytes, number=None):
+        self.pages += 1
+        ext = image_extension(img_bytes)
+
+        # JPEG/PNG/WebP já são comprimidos: só armazena
+        compression = zipfile.ZIP_STORED if ext else zipfile.ZIP_DEFLATED
+
+        self.zip.writestr(
+            f"{number or self.pages:03d}.{ext or 'jpg'}",
+            img_bytes,
+            compress_type=compression,
+        )
 
-    cbz_filename = f"{safe_title}_{safe_chapter}.cbz"
+    def finish(self):
+        self.zip.close()
+        self.file.seek(0)
+        return self.file
 
-    async with httpx.AsyncClient() as client:
-        tasks = [download_image(client, url) for url in image_urls]
-        images = await asyncio.gather(*tasks)
+    def discard(self):
+        self.zip.close()
+        self.file.close()
 
-    images = [img for img in images if img]
 
-    if not images:
-        raise Exception("Nenhuma imagem foi baixada")
+async def load_page(url):
+    data = await fetch_page(url)
+    optimized, cpu_time = await optimize(data)
+    return optimized, len(data), cpu_time
+
+
+# devolve ([(arquivo, nome), ...], estatísticas); o capítulo é dividido em
+# partes quando passaria de max_part_size
+async def create_cbz(image_urls, manga_title, chapter_name, max_part_size=CBZ_MAX_PART_SIZE):
+    parts = [CbzWriter()]
+    stats = {"pages": 0, "bytes_in": 0, "bytes_out": 0, "cpu_time": 0.0, "zip_time": 0.0}
+
+    # baixa em paralelo dentro de uma janela e grava na ordem das páginas,
+    # então no máximo CBZ_DOWNLOAD_WINDOW imagens ficam na memória
+    pending = deque()
+
+    async def write_next():
+        img_bytes, original_size, cpu_time = await pending.popleft()
+
+        if parts[-1].pages and parts[-1].size() + len(img_bytes) > max_part_size:
+            parts.append(CbzWriter())
+
+        stats["pages"] += 1
+        stats["bytes_in"] += original_size
+        stats["bytes_out"] += len(img_bytes)
+        stats["cpu_time"] += cpu_time
+
+        # no pool "zip" (threads: o CbzWriter não sai do processo)
+        start = time.perf_counter()
+        await executors.run("zip", parts[-1].add, img_bytes, stats["pages"])
+        stats["zip_time"] += time.perf_counter() - start
+
+    try:
+        for url in image_urls:
+            pending.append(asyncio.create_task(load_page(url)))
+            if len(pending) >= CBZ_DOWNLOAD_WINDOW:
+                await write_next()
 
-    # 🔥 CRIA CBZ NA MEMÓRIA
-    cbz_buffer = BytesIO()
+        while pending:
+            await write_next()
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        # recolhe os erros das páginas que já tinham falhado
+        await asyncio.gather(*pending, return_exceptions=True)
+        for writer in parts:
+            writer.discard()
+        raise
 
-    with zipfile.ZipFile(cbz_buffer, "w", compression=zipfile.ZIP_DEFLATED) as cbz:
-        for i, img_bytes in enumerate(images):
-            cbz.writestr(f"{i+1}.jpg", img_bytes)
+    if not stats["pages"]:
+        parts[0].discard()
+        raise DownloadError("Nenhuma imagem foi baixada")
 
-    cbz_buffer.seek(0)
+    if len(parts) == 1:
+        names = [cbz_filename(manga_title, chapter_name)]
+    else:
+        names = [
+            cbz_filename(manga_title, f"{chapter_name}_parte{i}")
+            for i in range(1, len(parts) + 1)
+        ]
 
-    return cbz_buffer, cbz_filename
+    files = [await executors.run("zip", writer.finish) for writer in parts]
+    return list(zip(files, names)), stats
@@ -0,0 +1,109 @@
+import asyncio
+import contextvars
+import hashlib
+import time
+from functools import partial
+
+from config import (
+    CHAPTER_CACHE_FILE,
+    CHAPTER_CACHE_TTL,
+    CHAPTER_CACHE_MAX_AGE,
+    CHAPTER_CACHE_SIZE,
+)
+from utils.cache import TTLCache
+from utils import executors
+
+# (fonte, id do mangá) -> lista de capítulos já ordenada + validadores HTTP
+_index = TTLCache(
+    CHAPTER_CACHE_SIZE,
+    CHAPTER_CACHE_MAX_AGE,
+    path=CHAPTER_CACHE_FILE,
+)
+_inflight = {}
+
+# guard(request) envolve a ida à rede (circuito, timeout e saúde da fonte
+# no loader); acertos do cache não passam por ele
+GUARD = contextvars.ContextVar("chapter_cache_guard", default=None)
+
+STATS = {
+    "fresh": 0,
+    "not_modified": 0,
+    "unchanged": 0,
+    "fetched": 0,
+}
+
+
+def _conditional_headers(entry):
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+async def _refresh(key, entry, request, parse):
+    r = await request(_conditional_headers(entry) if entry else {})
+
+    if entry and r.status_code == 304:
+        STATS["not_modified"] += 1
+    else:
+        r.raise_for_status()
+
+        # sem ETag/Last-Modified: compara o corpo antes de decodificar e ordenar
+        fingerprint = hashlib.sha1(r.content).hexdigest()
+        if entry and entry["fingerprint"] == fingerprint:
+            STATS["unchanged"] += 1
+        else:
+            STATS["fetched"] += 1
+            entry = {
+                "chapters": parse(await executors.loads(r.content)),
+                "fingerprint": fingerprint,
+            }
+
+        entry["etag"] = r.headers.get("ETag")
+        entry["last_modified"] = r.headers.get("Last-Modified")
+
+    entry["checked_at"] = time.time()
+    _index.set(key, entry)
+    return entry["chapters"]
+
+
+# request(headers) faz o GET da lista; parse(json) devolve a lista ordenada
+async def cached_chapters(source_name, manga_id, request, parse):
+    key = (source_name, str(manga_id))
+    entry = _index.get(key)
+
+    if entry and time.time() - entry["checked_at"] < CHAPTER_CACHE_TTL:
+        STATS["fresh"] += 1
+        return entry["chapters"]
+
+    task = _inflight.get(key)
+    if task is None:
+        refresh = partial(_refresh, key, entry, request, parse)
+        guard = GUARD.get()
+        task = asyncio.ensure_future(guard(refresh) if guard else refresh())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        # fonte fora do ar: a lista antiga ainda serve
+        if entry:
+            return entry["chapters"]
+        raise
+
+
+# última lista conhecida, mesmo vencida, para quando a fonte está fora
+def stale(source_name, manga_id):
+    entry = _index.get((source_name, str(manga_id)))
+    return entry["chapters"] if entry else None
+
+
+def stats():
+    return {
+        "hits": STATS["fresh"] + STATS["not_modified"] + STATS["unchanged"],
+        "misses": STATS["fetched"],
+        "size": len(_index),
+    }
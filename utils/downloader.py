@@ -1,23 +1,22 @@
-import httpx
 import asyncio
 
-async def fetch_image(client, url):
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-        }
-        r = await client.get(url, headers=headers, timeout=30.0)
-        r.raise_for_status()
-        return r.content
-    except Exception as e:
-        print(f"Erro ao baixar {url}: {e}")
-        return None
+from utils.scheduler import DownloadError
+from utils.page_store import fetch_page
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+}
+
 
 async def download_images(urls):
-    async with httpx.AsyncClient(http2=True, timeout=30.0) as client:
-        tasks = [fetch_image(client, url) for url in urls]
-        results = await asyncio.gather(*tasks)
-        downloaded = [img for img in results if img]
-        if not downloaded:
-            print("Nenhuma imagem foi baixada")
-        return downloaded
+    # falha inteira se alguma página não vier depois dos retries
+    results = await asyncio.gather(
+        *(fetch_page(url, headers=HEADERS) for url in urls),
+        return_exceptions=True,
+    )
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        raise DownloadError(f"{len(errors)} de {len(urls)} páginas falharam: {errors[0]}")
+
+    return results
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import EXECUTORS, PARSE_OFFLOAD_BYTES
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# pools criados na primeira tarefa; os de processo exigem funções de
+# módulo e argumentos que o pickle consiga levar
+_pools = {}
+_limits = {}
+
+STATS = {name: {"running": 0, "waiting": 0, "done": 0} for name in EXECUTORS}
+
+
+def _pool(name):
+    pool = _pools.get(name)
+    if pool is None:
+        config = EXECUTORS[name]
+        if config["kind"] == "process":
+            pool = ProcessPoolExecutor(max_workers=config["workers"])
+        else:
+            pool = ThreadPoolExecutor(max_workers=config["workers"], thread_name_prefix=name)
+        _pools[name] = pool
+    return pool
+
+
+def _limit(name):
+    limit = _limits.get(name)
+    if limit is None:
+        limit = _limits[name] = asyncio.Semaphore(EXECUTORS[name]["limit"])
+    return limit
+
+
+# ================= EXECUÇÃO =================
+async def run(name, fn, *args):
+    stats = STATS[name]
+    limit = _limit(name)
+
+    stats["waiting"] += 1
+    try:
+        await limit.acquire()
+    finally:
+        stats["waiting"] -= 1
+
+    stats["running"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pool(name), fn, *args)
+    finally:
+        stats["running"] -= 1
+        stats["done"] += 1
+        limit.release()
+
+
+# json.loads fora do loop quando o corpo é grande
+async def loads(content):
+    if len(content) < PARSE_OFFLOAD_BYTES:
+        return json.loads(content)
+    return await run("parse", json.loads, content)
+
+
+def shutdown():
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+    _limits.clear()
+
+
+metrics.Gauge(
+    "executor_tasks",
+    "Tarefas nos pools de executores por estado",
+    lambda: {
+        (("pool", name), ("state", state)): stats[state]
+        for name, stats in STATS.items()
+        for state in ("running", "waiting")
+    },
+)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from config import FILE_CACHE_DB, FILE_CACHE_TRUST_SECONDS
+
+# (fonte, id do capítulo) -> file_ids dos documentos já enviados ao Telegram
+# (mais de um quando o capítulo foi dividido em partes)
+_conn = None
+
+STATS = {
+    "hits": 0,
+    "misses": 0,
+    "invalidated": 0,
+}
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(FILE_CACHE_DB)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sent_files (
+                source TEXT NOT NULL,
+                chapter_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY (source, chapter_id)
+            )
+            """
+        )
+    return _conn
+
+
+def pages_fingerprint(image_urls):
+    return hashlib.sha1("\n".join(image_urls).encode()).hexdigest()
+
+
+def _file_ids(value):
+    # entradas antigas guardam um único file_id
+    return json.loads(value) if value.startswith("[") else [value]
+
+
+# ================= GET =================
+# sem fingerprint só aceita entradas verificadas há pouco tempo;
+# com fingerprint compara com a lista de páginas atual da fonte
+def get(source_name, chapter_id, fingerprint=None):
+    row = _db().execute(
+        "SELECT fingerprint, file_id, checked_at FROM sent_files "
+        "WHERE source = ? AND chapter_id = ?",
+        (source_name, str(chapter_id)),
+    ).fetchone()
+
+    if fingerprint is None:
+        if row and time.time() - row[2] < FILE_CACHE_TRUST_SECONDS:
+            STATS["hits"] += 1
+            return _file_ids(row[1])
+        return None
+
+    if row is None:
+        STATS["misses"] += 1
+        return None
+
+    if row[0] != fingerprint:
+        # a fonte mudou as páginas do capítulo
+        invalidate(source_name, chapter_id)
+        STATS["misses"] += 1
+        return None
+
+    with _db() as conn:
+        conn.execute(
+            "UPDATE sent_files SET checked_at = ? WHERE source = ? AND chapter_id = ?",
+            (time.time(), source_name, str(chapter_id)),
+        )
+    STATS["hits"] += 1
+    return _file_ids(row[1])
+
+
+# ================= PUT =================
+def put(source_name, chapter_id, fingerprint, file_ids):
+    with _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO sent_files VALUES (?, ?, ?, ?, ?)",
+            (source_name, str(chapter_id), fingerprint, json.dumps(file_ids), time.time()),
+        )
+
+
+def invalidate(source_name, chapter_id):
+    with _db() as conn:
+        deleted = conn.execute(
+            "DELETE FROM sent_files WHERE source = ? AND chapter_id = ?",
+            (source_name, str(chapter_id)),
+        ).rowcount
+    STATS["invalidated"] += deleted
+
+
+def size():
+    return _db().execute("SELECT COUNT(*) FROM sent_files").fetchone()[0]
+
+
+def close():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
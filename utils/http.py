@@ -0,0 +1,68 @@
+import asyncio
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import (
+    HTTP_TIMEOUT,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_KEEPALIVE_EXPIRY,
+)
+
+# HTTP/2 só é usado se o pacote "h2" estiver instalado (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# um cliente (e um pool de conexões) por origem, vivo durante toda a aplicação
+_clients = {}
+
+
+def _origin(url):
+    parts = urlsplit(str(url))
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+# ================= CLIENT =================
+def get_client(url, http2=True):
+    key = (_origin(url), http2 and HTTP2_AVAILABLE)
+    client = _clients.get(key)
+
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=key[1],
+            timeout=httpx.Timeout(HTTP_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
+        )
+        _clients[key] = client
+
+    return client
+
+
+async def request(method, url, http2=True, **kwargs):
+    return await get_client(url, http2=http2).request(method, url, **kwargs)
+
+
+async def get(url, http2=True, **kwargs):
+    return await request("GET", url, http2=http2, **kwargs)
+
+
+async def post(url, http2=True, **kwargs):
+    return await request("POST", url, http2=http2, **kwargs)
+
+
+# ================= SHUTDOWN =================
+async def close_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(
+        *(client.aclose() for client in clients),
+        return_exceptions=True,
+    )
@@ -0,0 +1,85 @@
+import io
+import logging
+import time
+
+from config import (
+    IMAGE_OPTIMIZE,
+    IMAGE_TARGET_WIDTH,
+    IMAGE_JPEG_QUALITY,
+)
+from utils import executors
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+if IMAGE_OPTIMIZE and Image is None:
+    logging.warning("IMAGE_OPTIMIZE ligado mas o Pillow não está instalado")
+
+ENABLED = IMAGE_OPTIMIZE and Image is not None
+
+# totais desde o início do processo
+STATS = {
+    "chapters": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "cpu_time": 0.0,
+}
+
+
+# ================= RECODIFICAÇÃO =================
+# roda nos processos do pool: devolve (bytes, tempo de CPU gasto)
+def optimize_image(data, target_width, quality):
+    start = time.process_time()
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        resize = target_width and img.width > target_width
+
+        # JPEG no tamanho certo não ganha nada sendo recodificado;
+        # GIF animado perderia a animação
+        if (img.format == "JPEG" and not resize) or getattr(img, "is_animated", False):
+            return data, time.process_time() - start
+
+        if resize:
+            height = round(img.height * target_width / img.width)
+            img = img.resize((target_width, height), Image.LANCZOS)
+
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        result = out.getvalue()
+    except Exception:
+        return data, time.process_time() - start
+
+    if len(result) >= len(data):
+        result = data
+    return result, time.process_time() - start
+
+
+async def optimize(data):
+    if not ENABLED:
+        return data, 0.0
+
+    return await executors.run(
+        "images",
+        optimize_image,
+        data,
+        IMAGE_TARGET_WIDTH,
+        IMAGE_JPEG_QUALITY,
+    )
+
+
+def record(stats):
+    STATS["chapters"] += 1
+    for key in ("bytes_in", "bytes_out", "cpu_time"):
+        STATS[key] += stats[key]
+
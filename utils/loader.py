@@ -1,11 +1,232 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import partial
+
+from config import (
+    SOURCE_HEALTH_WINDOW,
+    SOURCE_BREAKER_THRESHOLD,
+    SOURCE_BREAKER_COOLDOWN,
+    SOURCE_BREAKER_MAX_COOLDOWN,
+    SOURCE_TIMEOUT_FACTOR,
+    SOURCE_TIMEOUT_MIN,
+    SOURCE_TIMEOUT_MAX,
+    SOURCE_TIMEOUT_MIN_SAMPLES,
+)
 from sources.toonbr import ToonBrSource
 from sources.mangaflix import MangaFlixSource
+from utils import chapter_cache
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class SourceUnavailable(Exception):
+    pass
+
+
+# ================= SAÚDE =================
+# latência e erros recentes de uma fonte e o circuito que para de
+# chamá-la depois de SOURCE_BREAKER_THRESHOLD falhas seguidas
+class SourceHealth:
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = {}
+        self.results = deque(maxlen=SOURCE_HEALTH_WINDOW)
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = SOURCE_BREAKER_COOLDOWN
+        self.probing = False
+
+    # p99 das chamadas recentes da operação, ou None sem amostras suficientes
+    def percentile(self, op, q):
+        samples = self.latencies.get(op)
+        if not samples or len(samples) < SOURCE_TIMEOUT_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self, op):
+        # a chamada de teste tem o prazo cheio: a fonte pode só ter ficado lenta
+        p99 = self.percentile(op, 0.99)
+        if p99 is None or self.state == HALF_OPEN:
+            return SOURCE_TIMEOUT_MAX
+        return min(SOURCE_TIMEOUT_MAX, max(SOURCE_TIMEOUT_MIN, p99 * SOURCE_TIMEOUT_FACTOR))
+
+    # None libera a chamada; senão, segundos até o próximo teste
+    def check(self):
+        if self.state == OPEN:
+            remaining = self.opened_at + self.cooldown - time.time()
+            if remaining > 0:
+                return remaining
+            self.state = HALF_OPEN
+            self.probing = False
+
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return self.cooldown
+            self.probing = True
+        return None
+
+    def _sample(self, op, elapsed):
+        samples = self.latencies.get(op)
+        if samples is None:
+            samples = self.latencies[op] = deque(maxlen=SOURCE_HEALTH_WINDOW)
+        samples.append(elapsed)
+
+    def success(self, op, elapsed):
+        self._sample(op, elapsed)
+        self.results.append(True)
+        self.failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            logger.info("%s respondeu de novo, circuito fechado", self.name)
+            self.state = CLOSED
+            self.cooldown = SOURCE_BREAKER_COOLDOWN
+
+    def failure(self, op, elapsed, timed_out=False):
+        # um timeout entra na latência para o prazo crescer se a fonte ficou lenta
+        if timed_out:
+            self._sample(op, elapsed)
+        self.results.append(False)
+        self.failures += 1
+
+        if self.state == HALF_OPEN:
+            self.probing = False
+            self.cooldown = min(self.cooldown * 2, SOURCE_BREAKER_MAX_COOLDOWN)
+            self._open()
+        elif self.state == CLOSED and self.failures >= SOURCE_BREAKER_THRESHOLD:
+            self._open()
+
+    # chamada cancelada por quem esperava: não diz nada sobre a fonte
+    def abandoned(self):
+        self.probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+        logger.warning(
+            "%s com %d falhas seguidas, circuito aberto por %.0fs",
+            self.name, self.failures, self.cooldown,
+        )
+
+    def error_rate(self):
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "error_rate": self.error_rate(),
+            "p95": self.percentile("search", 0.95),
+            "retry_in": max(0.0, self.opened_at + self.cooldown - time.time())
+            if self.state == OPEN else 0.0,
+        }
+
+
+# ================= FONTE =================
+# mede latência e erros de cada chamada às fontes, aplica o circuito e
+# o timeout derivado; o resto é repassado
+class InstrumentedSource:
+
+    def __init__(self, source):
+        self._source = source
+        self.health = SourceHealth(source.name)
+
+    def __getattr__(self, name):
+        return getattr(self._source, name)
+
+    async def _call(self, op, *args):
+        return await self._guarded(op, partial(getattr(self._source, op), *args))
+
+    # só o que de fato vai à rede passa por aqui: um acerto do cache de
+    # capítulos não pode fechar o circuito nem puxar o timeout para baixo
+    async def _guarded(self, op, request):
+        retry_in = self.health.check()
+        if retry_in is not None:
+            metrics.SOURCE_ERRORS.inc(source=self.name, op=op, reason="circuit_open")
+            raise SourceUnavailable(f"{self.name} indisponível (novo teste em {retry_in:.0f}s)")
+
+        timeout = self.health.timeout(op)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(request(), timeout)
+        except asyncio.TimeoutError:
+            elapsed = time.perf_counter() - start
+            metrics.SOURCE_ERRORS.inc(source=self.name, op=op, reason="timeout")
+            self.health.failure(op, elapsed, timed_out=True)
+            logger.warning("%s.%s sem resposta em %.1fs", self.name, op, timeout)
+            raise SourceUnavailable(f"{self.name} não respondeu em {timeout:.0f}s")
+        except asyncio.CancelledError:
+            self.health.abandoned()
+            raise
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            metrics.SOURCE_ERRORS.inc(source=self.name, op=op, reason="exception")
+            self.health.failure(op, elapsed)
+            logger.warning("%s.%s falhou: %r", self.name, op, e)
+            raise
+        finally:
+            metrics.SOURCE_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, source=self.name, op=op
+            )
+
+        self.health.success(op, time.perf_counter() - start)
+        if not result:
+            metrics.SOURCE_ERRORS.inc(source=self.name, op=op, reason="empty")
+        return result
+
+    async def search(self, query):
+        return await self._call("search", query)
+
+    async def chapters(self, manga_id):
+        # as fontes passam pelo chapter_cache, que aplica o circuito e o
+        # timeout só quando precisa buscar a lista
+        token = chapter_cache.GUARD.set(partial(self._guarded, "chapters"))
+        try:
+            return await self._source.chapters(manga_id)
+        except Exception:
+            # a última lista conhecida serve enquanto a fonte está fora
+            stale = chapter_cache.stale(self.name, manga_id)
+            if stale is None:
+                raise
+            return stale
+        finally:
+            chapter_cache.GUARD.reset(token)
+
+    async def pages(self, chapter_id):
+        return await self._call("pages", chapter_id)
+
 
 # fontes disponíveis
 _sources = {
-    "ToonBr": ToonBrSource(),
-    "MangaFlix": MangaFlixSource()
+    "ToonBr": InstrumentedSource(ToonBrSource()),
+    "MangaFlix": InstrumentedSource(MangaFlixSource())
 }
 
 def get_all_sources():
     return _sources
+
+
+def health():
+    return {name: source.health.snapshot() for name, source in _sources.items()}
+
+
+metrics.Gauge(
+    "source_circuit_open",
+    "1 quando o circuito da fonte está aberto",
+    lambda: {(("source", name),): int(s.health.state == OPEN) for name, s in _sources.items()},
+)
+metrics.Gauge(
+    "source_error_rate",
+    "Fração de chamadas recentes da fonte que falharam",
+    lambda: {(("source", name),): s.health.error_rate() for name, s in _sources.items()},
+)
@@ -0,0 +1,196 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+_registry = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+
+# ================= TIPOS =================
+class Counter:
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(_key(labels), 0)
+
+    def total(self):
+        return sum(self.values.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS, reservoir=1024):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.reservoir = reservoir
+        # por conjunto de labels: [contagens por bucket, soma, total, amostras recentes]
+        self.series = {}
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = _key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0, deque(maxlen=self.reservoir)]
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+        series[3].append(value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    # percentil das amostras recentes, para o /status
+    def percentile(self, q, **labels):
+        series = self.series.get(_key(labels))
+        if not series or not series[3]:
+            return None
+        ordered = sorted(series[3])
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def count(self, **labels):
+        series = self.series.get(_key(labels))
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count, _) in self.series.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+# valor lido na hora da coleta; fn devolve um número ou {labels: número}
+class Gauge:
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+
+        if isinstance(value, dict):
+            for labels, v in value.items():
+                lines.append(f"{self.name}{_format_labels(_key(dict(labels)))} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ================= MÉTRICAS =================
+CHAPTER_STAGE_SECONDS = Histogram(
+    "chapter_stage_seconds",
+    "Tempo de cada estágio do envio de capítulo (pages, build, zip, upload)",
+)
+PAGE_DOWNLOAD_SECONDS = Histogram(
+    "page_download_seconds",
+    "Tempo de cada requisição de imagem",
+)
+PAGE_DOWNLOAD_ERRORS = Counter(
+    "page_download_errors_total",
+    "Falhas ao baixar imagens (inclui as que foram repetidas)",
+)
+SOURCE_REQUEST_SECONDS = Histogram(
+    "source_request_seconds",
+    "Latência das chamadas às fontes (search, chapters, pages)",
+)
+SOURCE_ERRORS = Counter(
+    "source_errors_total",
+    "Chamadas às fontes que falharam ou voltaram vazias",
+)
+TELEGRAM_RETRY_AFTER_SECONDS = Counter(
+    "telegram_retry_after_seconds_total",
+    "Tempo esperado por causa de RetryAfter do Telegram",
+)
+JOB_WAIT_SECONDS = Histogram(
+    "job_wait_seconds",
+    "Tempo entre o job entrar na fila e um worker pegá-lo",
+    buckets=(1, 5, 15, 30, 60, 300, 900, 1800, 3600, 7200, 21600),
+)
+JOBS_FINISHED = Counter(
+    "jobs_finished_total",
+    "Jobs concluídos por status",
+)
+CHAPTERS_SENT = Counter(
+    "chapters_sent_total",
+    "Capítulos enviados por fonte que forneceu as páginas (mirror=1 quando foi um espelho)",
+)
+
+
+# ================= SERVIDOR =================
+_runner = None
+
+
+async def start_server(host, port):
+    global _runner
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+
+    _runner = web.AppRunner(app, access_log=None)
+    await _runner.setup()
+    await web.TCPSite(_runner, host, port).start()
+
+
+async def stop_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+
+from config import MIRROR_RACE_ERROR_RATE, MIRROR_INDEX_TTL, MIRROR_INDEX_SIZE
+from utils.cache import TTLCache
+from utils.loader import get_all_sources, OPEN, CLOSED
+from utils.search import cached_search
+from utils.text import title_key
+
+logger = logging.getLogger(__name__)
+
+# (fonte espelho, título normalizado) -> id do mangá lá, ou None se não tem
+_index = TTLCache(MIRROR_INDEX_SIZE, MIRROR_INDEX_TTL)
+
+STATS = {
+    "lookups": 0,
+    "found": 0,
+}
+
+
+def chapter_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ================= ÍNDICE =================
+async def _mirror_manga(mirror, title):
+    key = (mirror.name, title_key(title))
+
+    async def lookup():
+        for manga in await cached_search(mirror.name, mirror, title):
+            if title_key(manga.get("title")) == key[1]:
+                return manga["url"]
+        return None
+
+    return await _index.get_or_fetch(key, lookup)
+
+
+async def _mirror_chapter(mirror, title, number):
+    manga_id = await _mirror_manga(mirror, title)
+    if manga_id is None:
+        return None
+
+    for chapter in await mirror.chapters(manga_id):
+        if chapter_number(chapter.get("chapter_number")) == number:
+            return chapter
+    return None
+
+
+# o mesmo capítulo nas outras fontes: [(fonte, capítulo)]; fontes com o
+# circuito aberto ficam de fora
+async def find_mirrors(source_name, chapter):
+    number = chapter_number(chapter.get("chapter_number"))
+    title = chapter.get("manga_title")
+    if number is None or not title:
+        return []
+
+    mirrors = [
+        source for name, source in get_all_sources().items()
+        if name != source_name and source.health.state != OPEN
+    ]
+    STATS["lookups"] += 1
+
+    results = await asyncio.gather(
+        *(_mirror_chapter(mirror, title, number) for mirror in mirrors),
+        return_exceptions=True,
+    )
+
+    found = []
+    for mirror, result in zip(mirrors, results):
+        if isinstance(result, Exception):
+            logger.info("Espelho %s indisponível para %s: %r", mirror.name, title, result)
+        elif result is not None:
+            found.append((mirror, result))
+
+    if found:
+        STATS["found"] += 1
+    return found
+
+
+# fonte instável: vale consultar o espelho ao mesmo tempo
+def degraded(source):
+    health = source.health
+    return health.state != CLOSED or health.error_rate() >= MIRROR_RACE_ERROR_RATE
+
+
+# ================= CORRIDA =================
+# roda attempt(candidato) para todos e devolve o primeiro que der certo;
+# se todos falharem, levanta o erro do primeiro candidato
+async def race(candidates, attempt):
+    tasks = [asyncio.create_task(attempt(candidate)) for candidate in candidates]
+    first_error = None
+    try:
+        for future in asyncio.as_completed(tasks):
+            try:
+                return await future
+            except Exception as e:
+                first_error = first_error or e
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # o erro da fonte principal é o mais útil para quem pediu
+    raise tasks[0].exception() or first_error
+
+
+def stats():
+    return {
+        **STATS,
+        "size": len(_index),
+    }
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+
+from config import PAGE_STORE, PAGE_STORE_DIR, PAGE_STORE_DB, PAGE_STORE_MAX_BYTES
+from utils.scheduler import fetch
+
+# imagens em PAGE_STORE_DIR/<2 primeiros>/<sha256>; o índice em SQLite
+# liga cada URL ao conteúdo, então a mesma imagem em URLs diferentes
+# (créditos, banners) ocupa o disco uma vez só
+_conn = None
+_total = None
+
+STATS = {
+    "hits": 0,
+    "misses": 0,
+    "deduplicated": 0,
+    "evicted": 0,
+}
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        os.makedirs(PAGE_STORE_DIR, exist_ok=True)
+        _conn = sqlite3.connect(PAGE_STORE_DB, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS blobs_used ON blobs (used_at)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS urls_digest ON urls (digest)")
+        _conn.commit()
+    return _conn
+
+
+def _path(digest):
+    return os.path.join(PAGE_STORE_DIR, digest[:2], digest)
+
+
+def _read(digest):
+    with open(_path(digest), "rb") as f:
+        return f.read()
+
+
+def _write(digest, data):
+    path = _path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _remove(digest):
+    try:
+        os.remove(_path(digest))
+    except FileNotFoundError:
+        pass
+
+
+# ================= GET / PUT =================
+async def get(url):
+    row = _db().execute(
+        "SELECT digest FROM urls WHERE url = ?", (url,)
+    ).fetchone()
+    if row is None:
+        STATS["misses"] += 1
+        return None
+
+    digest = row[0]
+    try:
+        data = await asyncio.to_thread(_read, digest)
+    except FileNotFoundError:
+        # arquivo apagado por fora: esquece a entrada
+        _forget(digest)
+        STATS["misses"] += 1
+        return None
+
+    with _db() as conn:
+        conn.execute("UPDATE blobs SET used_at = ? WHERE digest = ?", (time.time(), digest))
+    STATS["hits"] += 1
+    return data
+
+
+async def put(url, data):
+    global _total
+    digest = hashlib.sha256(data).hexdigest()
+
+    known = _db().execute(
+        "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+    ).fetchone()
+    if known:
+        STATS["deduplicated"] += 1
+    else:
+        await asyncio.to_thread(_write, digest, data)
+
+    with _db() as conn:
+        conn.execute(
+            "INSERT INTO blobs (digest, size, used_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (digest) DO UPDATE SET used_at = excluded.used_at",
+            (digest, len(data), time.time()),
+        )
+        conn.execute(
+            "INSERT INTO urls (url, digest) VALUES (?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET digest = excluded.digest",
+            (url, digest),
+        )
+
+    if not known:
+        # size() já conta o blob que acabou de entrar
+        _total = size() if _total is None else _total + len(data)
+        if _total > PAGE_STORE_MAX_BYTES:
+            await _evict()
+
+
+def _forget(digest):
+    with _db() as conn:
+        conn.execute("DELETE FROM urls WHERE digest = ?", (digest,))
+        conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+
+
+# ================= LRU =================
+# apaga os menos usados até 90% do limite; o total é recontado porque
+# outros processos (workers externos) também gravam aqui
+async def _evict():
+    global _total
+    _total = size()
+    target = PAGE_STORE_MAX_BYTES * 0.9
+    if _total <= target:
+        return
+
+    victims = []
+    freed = 0
+    for digest, blob_size in _db().execute("SELECT digest, size FROM blobs ORDER BY used_at"):
+        if _total - freed <= target:
+            break
+        victims.append(digest)
+        freed += blob_size
+
+    for digest in victims:
+        _forget(digest)
+    await asyncio.to_thread(lambda: [_remove(digest) for digest in victims])
+
+    _total -= freed
+    STATS["evicted"] += len(victims)
+
+
+# capítulo entregue: as páginas dele são as primeiras a sair do disco,
+# menos as compartilhadas com outras URLs (créditos, banners), que são
+# justamente as que a deduplicação quer manter
+def release(urls):
+    if not PAGE_STORE:
+        return
+    with _db() as conn:
+        conn.executemany(
+            "UPDATE blobs SET used_at = 0 "
+            "WHERE digest = (SELECT digest FROM urls WHERE url = ?) "
+            "AND (SELECT COUNT(*) FROM urls WHERE urls.digest = blobs.digest) = 1",
+            [(url,) for url in urls],
+        )
+
+
+# com PAGE_STORE=0 nada abaixo pode criar o diretório ou o banco
+def size():
+    if not PAGE_STORE:
+        return 0
+    return _db().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+
+# ================= DOWNLOAD =================
+# página do disco se já foi baixada antes; senão da CDN, guardando o resultado
+async def fetch_page(url, headers=None):
+    if not PAGE_STORE:
+        return await fetch(url, headers=headers)
+
+    data = await get(url)
+    if data is not None:
+        return data
+
+    data = await fetch(url, headers=headers)
+    try:
+        await put(url, data)
+    except OSError as e:
+        # disco cheio ou sem permissão: o download segue sem o cache
+        print(f"Erro ao guardar página: {e}")
+    return data
+
+
+def stats():
+    return {
+        **STATS,
+        "enabled": PAGE_STORE,
+        "bytes": size(),
+        "max_bytes": PAGE_STORE_MAX_BYTES,
+    }
+
+
+def close():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+_DONE = object()
+
+
+# ================= PIPELINE =================
+# cada item (um dict de contexto) passa pelos estágios em ordem; estágios
+# diferentes trabalham em itens diferentes ao mesmo tempo e as filas
+# limitadas entre eles seguram o produtor quando o consumidor atrasa.
+# Um estágio que falha grava a exceção em item["error"] e os seguintes
+# deixam o item passar; finish recebe todos os itens, com ou sem erro, e
+# uma exceção dele só é registrada para não derrubar o resto do lote.
+async def run_pipeline(items, stages, finish, depth=1):
+    queues = [asyncio.Queue(maxsize=depth) for _ in range(len(stages) + 1)]
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        await queues[0].put(_DONE)
+
+    async def run_stage(stage, inbox, outbox):
+        while True:
+            item = await inbox.get()
+            if item is not _DONE and "error" not in item:
+                try:
+                    await stage(item)
+                except Exception as e:
+                    item["error"] = e
+            await outbox.put(item)
+            if item is _DONE:
+                return
+
+    async def run_finish(inbox):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            try:
+                await finish(item)
+            except Exception:
+                logging.exception("Erro ao finalizar item do pipeline")
+
+    tasks = [asyncio.create_task(feed())]
+    for i, stage in enumerate(stages):
+        tasks.append(asyncio.create_task(run_stage(stage, queues[i], queues[i + 1])))
+
+    try:
+        await run_finish(queues[-1])
+    finally:
+        for task in tasks:
+            task.cancel()
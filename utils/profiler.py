@@ -0,0 +1,148 @@
+import asyncio
+import inspect
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+from config import (
+    LOOP_MONITOR_INTERVAL,
+    LOOP_BLOCK_THRESHOLD,
+    PROFILE_INTERVAL,
+)
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_LAG_SECONDS = metrics.Histogram(
+    "event_loop_lag_seconds",
+    "Atraso do event loop em acordar um sleep",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+EVENT_LOOP_BLOCKS = metrics.Counter(
+    "event_loop_blocks_total",
+    "Vezes que o event loop ficou travado acima de LOOP_BLOCK_THRESHOLD",
+)
+
+STATS = {
+    "max_lag": 0.0,
+    "blocks": 0,
+}
+
+
+# ================= LAG =================
+# um sleep que acorda atrasado mede o quanto o loop ficou ocupado; o
+# watchdog numa thread vê o loop parado e registra a pilha do culpado
+class LoopMonitor:
+
+    def __init__(self, interval=LOOP_MONITOR_INTERVAL, threshold=LOOP_BLOCK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.heartbeat = time.monotonic()
+        self.loop_thread = None
+        self.task = None
+        self.stopping = threading.Event()
+        self.watchdog = None
+
+    def start(self):
+        self.loop_thread = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.task = asyncio.get_running_loop().create_task(self._measure())
+        self.watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.watchdog.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _measure(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self.heartbeat = now
+
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            STATS["max_lag"] = max(STATS["max_lag"], lag)
+
+    def _watch(self):
+        reported = None
+        while not self.stopping.wait(self.threshold / 4):
+            beat = self.heartbeat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or reported == beat:
+                continue
+
+            # uma vez por travada
+            reported = beat
+            STATS["blocks"] += 1
+            EVENT_LOOP_BLOCKS.inc()
+
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            logger.warning(
+                "Event loop travado há %.2fs em %s\n%s",
+                stalled,
+                current_coroutine(frame),
+                "".join(traceback.format_stack(frame)),
+            )
+
+
+def current_coroutine(frame):
+    # a corrotina mais interna na pilha é a que está segurando o loop
+    while frame is not None:
+        if frame.f_code.co_flags & (inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR):
+            return f"{frame.f_code.co_qualname} ({frame.f_code.co_filename}:{frame.f_lineno})"
+        frame = frame.f_back
+    return "código síncrono"
+
+
+# ================= PERFIL =================
+# amostra a pilha de todas as threads e devolve o formato "folded"
+# (uma pilha por linha + contagem), que flamegraph.pl e speedscope leem
+_profile_lock = asyncio.Lock()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_qualname} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+def _sample(seconds, interval):
+    samples = Counter()
+    me = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me or names.get(ident) == "loop-watchdog":
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            samples[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+
+    return samples
+
+
+async def profile(seconds, interval=PROFILE_INTERVAL):
+    async with _profile_lock:
+        samples = await asyncio.to_thread(_sample, seconds, interval)
+    lines = [f"{stack} {count}" for stack, count in samples.most_common()]
+    return "\n".join(lines) + "\n", sum(samples.values())
+
+
+def stats():
+    return {
+        **STATS,
+        "lag_p95": EVENT_LOOP_LAG_SECONDS.percentile(0.95),
+    }
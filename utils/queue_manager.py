@@ -1,42 +1,364 @@
 import asyncio
 import json
-import os
+import sqlite3
+import time
+from collections import deque
 
-QUEUE_FILE = "queue.json"
+from config import (
+    QUEUE_DB,
+    QUEUE_HISTORY_SECONDS,
+    WORKER_MODE,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+)
 
-DOWNLOAD_QUEUE = asyncio.Queue()
 
+# ================= FILA JUSTA =================
+# uma fila por chat, atendidas em round-robin. Um chat só fica com um
+# worker por vez, então os capítulos de cada chat chegam em ordem enquanto
+# chats diferentes são processados em paralelo
+class FairQueue:
 
-# ================= SAVE =================
-def save_queue(data):
-    with open(QUEUE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f)
+    def __init__(self):
+        self._chats = {}
+        self._ready = deque()
+        self._busy = set()
+        self._waiters = deque()
 
+    def put_nowait(self, job):
+        chat_id = job["chat_id"]
+        jobs = self._chats.setdefault(chat_id, deque())
+        jobs.append(job)
 
-def load_queue():
-    if not os.path.exists(QUEUE_FILE):
-        return []
+        if len(jobs) == 1 and chat_id not in self._busy:
+            self._ready.append(chat_id)
+            self._wakeup()
 
-    with open(QUEUE_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    async def put(self, job):
+        self.put_nowait(job)
+
+    async def get(self):
+        return (await self.get_batch(1))[0]
+
+    # até limit jobs seguidos do próximo chat da roda
+    async def get_batch(self, limit):
+        while not self._ready:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif self._ready:
+                    self._wakeup()
+                raise
+
+        chat_id = self._ready.popleft()
+        self._busy.add(chat_id)
+
+        jobs = self._chats[chat_id]
+        return [jobs.popleft() for _ in range(min(limit, len(jobs)))]
+
+    def task_done(self, chat_id):
+        self._busy.discard(chat_id)
+
+        # o chat volta para o fim da roda
+        if self._chats.get(chat_id):
+            self._ready.append(chat_id)
+            self._wakeup()
+        else:
+            self._chats.pop(chat_id, None)
+
+    def qsize(self):
+        return sum(len(jobs) for jobs in self._chats.values())
+
+    def chats(self):
+        return len(self._chats)
+
+    def _wakeup(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+
+DOWNLOAD_QUEUE = FairQueue()
+
+# journal em SQLite (WAL): cada enqueue é um INSERT e cada job concluído
+# é confirmado pelo id, então a fila sobrevive a reinícios. No modo
+# external a mesma tabela é o broker entre o bot e os processos worker
+_conn = None
+
+_LEASE_COLUMNS = (
+    ("worker", "TEXT"),
+    ("lease_until", "REAL"),
+    ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(QUEUE_DB, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                created_at REAL NOT NULL,
+                finished_at REAL
+            )
+            """
+        )
+        columns = {row[1] for row in _conn.execute("PRAGMA table_info(jobs)")}
+        for name, decl in _LEASE_COLUMNS:
+            if name not in columns:
+                _conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+        _conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS jobs_chat ON jobs (chat_id, status)")
+        # última vez que cada chat foi atendido, para o round-robin entre processos
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_turns (chat_id INTEGER PRIMARY KEY, served_at REAL NOT NULL)"
+        )
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, pid INTEGER, seen_at REAL NOT NULL)"
+        )
+        _conn.commit()
+    return _conn
+
+
+def _row(job):
+    job.setdefault("created_at", time.time())
+    return (job["chat_id"], job["source"], json.dumps(job["chapter"]), job["created_at"])
 
 
 # ================= ADD =================
 async def add_job(job):
-    await DOWNLOAD_QUEUE.put(job)
+    await add_jobs([job])
+
+
+async def add_jobs(jobs):
+    with _db() as conn:
+        for job in jobs:
+            job["id"] = conn.execute(
+                "INSERT INTO jobs (chat_id, source, chapter, created_at) VALUES (?, ?, ?, ?)",
+                _row(job),
+            ).lastrowid
+
+    if WORKER_MODE == "inline":
+        for job in jobs:
+            await DOWNLOAD_QUEUE.put(job)
+
+
+# ================= ACK =================
+def ack_job(job, status="done"):
+    with _db() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+            (status, time.time(), job["id"]),
+        )
+
+
+# ================= RESTORE =================
+def compact_jobs():
+    with _db() as conn:
+        conn.execute(
+            "DELETE FROM jobs WHERE status != 'pending' AND finished_at < ?",
+            (time.time() - QUEUE_HISTORY_SECONDS,),
+        )
+
 
-    data = load_queue()
-    data.append(job["meta"])
-    save_queue(data)
+def restore_jobs():
+    compact_jobs()
 
+    rows = _db().execute(
+        "SELECT id, chat_id, source, chapter, created_at FROM jobs "
+        "WHERE status = 'pending' ORDER BY id"
+    ).fetchall()
 
-# ================= REMOVE =================
-def remove_job():
-    data = load_queue()
-    if data:
-        data.pop(0)
-        save_queue(data)
+    for job_id, chat_id, source, chapter, created_at in rows:
+        DOWNLOAD_QUEUE.put_nowait({
+            "id": job_id,
+            "chat_id": chat_id,
+            "source": source,
+            "chapter": json.loads(chapter),
+            "created_at": created_at,
+        })
+
+    return len(rows)
 
 
 def queue_size():
-    return DOWNLOAD_QUEUE.qsize()
+    if WORKER_MODE == "inline":
+        return DOWNLOAD_QUEUE.qsize()
+    return _db().execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = 'pending' "
+        "AND (lease_until IS NULL OR lease_until < ?)",
+        (time.time(),),
+    ).fetchone()[0]
+
+
+def queue_chats():
+    if WORKER_MODE == "inline":
+        return DOWNLOAD_QUEUE.chats()
+    return _db().execute(
+        "SELECT COUNT(DISTINCT chat_id) FROM jobs WHERE status = 'pending'"
+    ).fetchone()[0]
+
+
+# jobs ainda não confirmados, inclusive os que estão com um worker
+def pending_jobs(chat_id=None):
+    if chat_id is None:
+        return _db().execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'").fetchone()[0]
+    return _db().execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = 'pending' AND chat_id = ?", (chat_id,)
+    ).fetchone()[0]
+
+
+def oldest_job_age():
+    oldest = _db().execute(
+        "SELECT MIN(created_at) FROM jobs WHERE status = 'pending'"
+    ).fetchone()[0]
+    return time.time() - oldest if oldest else 0
+
+
+# ================= BROKER =================
+# usado pelos processos worker. A entrega é pelo menos uma vez: um job
+# cujo lease expirou (worker morto ou travado) é entregue de novo
+def _job(row):
+    job_id, chat_id, source, chapter, created_at, attempts = row
+    return {
+        "id": job_id,
+        "chat_id": chat_id,
+        "source": source,
+        "chapter": json.loads(chapter),
+        "created_at": created_at,
+        "attempts": attempts,
+    }
+
+
+# até limit jobs do próximo chat da roda; como na FairQueue, um chat
+# só fica com um worker por vez
+def claim_jobs(worker_id, limit):
+    now = time.time()
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            """
+            SELECT j.chat_id FROM jobs j
+            LEFT JOIN chat_turns t ON t.chat_id = j.chat_id
+            WHERE j.status = 'pending'
+              AND j.attempts < :max_attempts
+              AND (j.lease_until IS NULL OR j.lease_until < :now)
+              AND j.chat_id NOT IN (
+                  SELECT chat_id FROM jobs WHERE status = 'pending' AND lease_until >= :now
+              )
+            GROUP BY j.chat_id
+            ORDER BY COALESCE(MAX(t.served_at), 0), MIN(j.id)
+            LIMIT 1
+            """,
+            {"now": now, "max_attempts": JOB_MAX_ATTEMPTS},
+        ).fetchone()
+        if row is None:
+            conn.commit()
+            return []
+
+        chat_id = row[0]
+        jobs = [
+            _job(row) for row in conn.execute(
+                "SELECT id, chat_id, source, chapter, created_at, attempts + 1 FROM jobs "
+                "WHERE status = 'pending' AND chat_id = ? AND attempts < ? ORDER BY id LIMIT ?",
+                (chat_id, JOB_MAX_ATTEMPTS, limit),
+            )
+        ]
+        conn.executemany(
+            "UPDATE jobs SET worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+            [(worker_id, now + JOB_LEASE_SECONDS, job["id"]) for job in jobs],
+        )
+        conn.execute(
+            "INSERT INTO chat_turns (chat_id, served_at) VALUES (?, ?) "
+            "ON CONFLICT (chat_id) DO UPDATE SET served_at = excluded.served_at",
+            (chat_id, now),
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    return jobs
+
+
+# jobs que já foram entregues JOB_MAX_ATTEMPTS vezes sem confirmação
+# (em transação: só um processo desiste de cada job e avisa o chat)
+def expire_jobs():
+    now = time.time()
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            "SELECT id, chat_id, source, chapter, created_at, attempts FROM jobs "
+            "WHERE status = 'pending' AND (lease_until IS NULL OR lease_until < ?) "
+            "AND attempts >= ?",
+            (now, JOB_MAX_ATTEMPTS),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, lease_until = NULL WHERE id = ?",
+            [(now, row[0]) for row in rows],
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return [_job(row) for row in rows]
+
+
+# renova o lease dos jobs do worker e marca o worker como vivo
+def heartbeat(worker_id, pid=None):
+    now = time.time()
+    with _db() as conn:
+        conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE worker = ? AND status = 'pending'",
+            (now + JOB_LEASE_SECONDS, worker_id),
+        )
+        conn.execute(
+            "INSERT INTO workers (id, pid, seen_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET seen_at = excluded.seen_at",
+            (worker_id, pid, now),
+        )
+
+
+# devolve os jobs que o worker não terminou; refund não conta a entrega
+# (worker parado normalmente, não por causa do job)
+def release_jobs(worker_id, refund=True):
+    with _db() as conn:
+        conn.execute(
+            "UPDATE jobs SET worker = NULL, lease_until = NULL, "
+            "attempts = MAX(attempts - ?, 0) WHERE worker = ? AND status = 'pending'",
+            (1 if refund else 0, worker_id),
+        )
+
+
+def remove_worker(worker_id):
+    with _db() as conn:
+        conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+
+def active_workers():
+    with _db() as conn:
+        conn.execute("DELETE FROM workers WHERE seen_at < ?", (time.time() - JOB_LEASE_SECONDS,))
+    return _db().execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+
+
+def close():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
@@ -0,0 +1,181 @@
+import asyncio
+import contextlib
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GROUP_RATE,
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_INTERACTIVE_RESERVE,
+    TELEGRAM_CHAT_RESERVE,
+    TELEGRAM_MAX_RETRIES,
+)
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# chamadas que não contam para os limites de envio
+_UNLIMITED = {"getUpdates", "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo"}
+# apagar não é enviar: só contam no limite global, não no do chat
+_CHAT_FREE = {"deleteMessage", "deleteMessages"}
+
+TELEGRAM_THROTTLE_SECONDS = metrics.Counter(
+    "telegram_throttle_seconds_total",
+    "Tempo que as chamadas à Bot API esperaram no limitador",
+)
+
+
+def retry_after_seconds(error):
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+# ================= TOKEN BUCKET =================
+# a taxa cai depois de um RetryAfter e volta aos poucos até a taxa base
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # segundos até haver um token acima da reserva; a reserva nunca passa
+    # de capacity - 1, senão um balde pequeno (taxa global dividida entre
+    # processos) jamais acumularia o bastante para uma chamada em massa
+    def delay(self, now, reserve=0.0):
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        reserve = min(reserve, max(self.capacity - 1, 0))
+        missing = 1 + reserve - self.tokens
+        return max(missing, 0) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+        # recuperação lenta depois de uma penalidade
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate * 1.02)
+
+    def penalize(self, retry_after, now):
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.rate = max(self.base_rate / 10, self.rate * 0.7)
+        self.tokens = 0
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+# ================= LIMITADOR =================
+# todas as chamadas do bot passam por aqui (ApplicationBuilder.rate_limiter).
+# Edições e respostas interativas têm prioridade; uploads em massa passam
+# rate_limit_args={"priority": "bulk"} e só usam o que sobra da reserva
+class TelegramRateLimiter(BaseRateLimiter):
+
+    # processes: quantos processos falam com a Bot API pelo mesmo token,
+    # cada um com o seu limitador (WORKER_MODE=external). A taxa global é
+    # dividida entre todos; a de cada chat só por dois, porque um chat fica
+    # com um consumidor por vez (claim_jobs) além das respostas do bot
+    def __init__(self, max_retries=TELEGRAM_MAX_RETRIES, processes=1):
+        self.max_retries = max_retries
+        self._chat_share = min(processes, 2)
+        self._global = TokenBucket(TELEGRAM_GLOBAL_RATE / processes)
+        self._chats = {}
+        self._interactive_waiting = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 1000:
+                now = time.monotonic()
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle(now)}
+
+            group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(
+                (TELEGRAM_GROUP_RATE if group else TELEGRAM_CHAT_RATE) / self._chat_share,
+                capacity=max(1.0, TELEGRAM_CHAT_BURST / self._chat_share),
+            )
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, chat_id, priority):
+        bulk = priority == BULK
+        global_reserve = self._global.capacity * TELEGRAM_INTERACTIVE_RESERVE if bulk else 0.0
+        chat_reserve = TELEGRAM_CHAT_RESERVE if bulk else 0.0
+        started = time.monotonic()
+
+        while True:
+            now = time.monotonic()
+            wait = self._global.delay(now, global_reserve)
+            if chat_id is not None:
+                wait = max(wait, self._chat_bucket(chat_id).delay(now, chat_reserve))
+            if priority == BULK and self._interactive_waiting:
+                wait = max(wait, 0.05)
+
+            if wait <= 0:
+                self._global.take()
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).take()
+                break
+
+            if priority == INTERACTIVE:
+                self._interactive_waiting += 1
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._interactive_waiting -= 1
+            else:
+                await asyncio.sleep(wait)
+
+        waited = time.monotonic() - started
+        if waited:
+            TELEGRAM_THROTTLE_SECONDS.inc(waited, priority=priority)
+
+    def _on_retry_after(self, chat_id, seconds):
+        now = time.monotonic()
+        metrics.TELEGRAM_RETRY_AFTER_SECONDS.inc(seconds)
+        if chat_id is not None:
+            self._chat_bucket(chat_id).penalize(seconds, now)
+        else:
+            self._global.penalize(seconds, now)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint in _UNLIMITED:
+            return await callback(*args, **kwargs)
+
+        priority = (rate_limit_args or {}).get("priority", INTERACTIVE)
+        chat_id = None if endpoint in _CHAT_FREE else data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                seconds = retry_after_seconds(e)
+                logger.info("RetryAfter de %.0fs em %s (chat %s)", seconds, endpoint, chat_id)
+                self._on_retry_after(chat_id, seconds)
+                if attempt == self.max_retries:
+                    raise
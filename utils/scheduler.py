@@ -0,0 +1,161 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import (
+    DOWNLOAD_TIMEOUT,
+    DOWNLOAD_HOST_CONCURRENCY,
+    DOWNLOAD_HOST_MIN_CONCURRENCY,
+    DOWNLOAD_HOST_MAX_CONCURRENCY,
+    DOWNLOAD_RETRIES,
+    DOWNLOAD_BACKOFF_BASE,
+    DOWNLOAD_BACKOFF_MAX,
+)
+from utils import http, metrics
+
+
+class DownloadError(Exception):
+    pass
+
+
+# ================= LIMITE POR HOST =================
+# AIMD: sobe o limite aos poucos enquanto o host responde bem,
+# corta pela metade em 429/5xx e reduz quando a latência dispara
+class HostLimiter:
+
+    def __init__(
+        self,
+        limit=DOWNLOAD_HOST_CONCURRENCY,
+        minimum=DOWNLOAD_HOST_MIN_CONCURRENCY,
+        maximum=DOWNLOAD_HOST_MAX_CONCURRENCY,
+    ):
+        self.limit = limit
+        self.minimum = minimum
+        self.maximum = maximum
+        self.active = 0
+        self.blocked_until = 0.0
+        self.latency = None
+        self.best_latency = None
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+        try:
+            # Retry-After vale para o host inteiro
+            pause = self.blocked_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            yield
+        finally:
+            async with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency):
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+
+        if self.latency > 3 * self.best_latency:
+            self._decrease(0.8)
+            return
+
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self._successes = 0
+            self.limit += 1
+
+    def on_throttle(self, retry_after=None):
+        self._decrease(0.5)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def _decrease(self, factor):
+        now = time.monotonic()
+        # no máximo uma redução por segundo
+        if now - self._last_decrease < 1:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(self.minimum, int(self.limit * factor))
+
+
+_limiters = {}
+
+
+def get_limiter(url):
+    host = urlsplit(url).netloc
+    if host not in _limiters:
+        _limiters[host] = HostLimiter()
+    return _limiters[host]
+
+
+# ================= RETRY =================
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return min(float(value), DOWNLOAD_BACKOFF_MAX)
+    except ValueError:
+        pass
+
+    try:
+        delay = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+    return min(max(delay, 0), DOWNLOAD_BACKOFF_MAX)
+
+
+def backoff(attempt):
+    # "full jitter"
+    return random.uniform(0, min(DOWNLOAD_BACKOFF_MAX, DOWNLOAD_BACKOFF_BASE * 2 ** attempt))
+
+
+async def fetch(url, headers=None, retries=DOWNLOAD_RETRIES):
+    limiter = get_limiter(url)
+    host = urlsplit(url).netloc
+    error = None
+
+    for attempt in range(retries + 1):
+        delay = None
+
+        async with limiter.slot():
+            start = time.monotonic()
+            try:
+                r = await http.get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+            except httpx.TransportError as e:
+                error = repr(e)
+                limiter.on_throttle()
+                metrics.PAGE_DOWNLOAD_ERRORS.inc(host=host, reason=type(e).__name__)
+            else:
+                latency = time.monotonic() - start
+                metrics.PAGE_DOWNLOAD_SECONDS.observe(latency, host=host)
+
+                if r.status_code == 429 or r.status_code >= 500:
+                    error = f"HTTP {r.status_code}"
+                    delay = retry_after_seconds(r)
+                    limiter.on_throttle(delay)
+                    metrics.PAGE_DOWNLOAD_ERRORS.inc(host=host, reason=str(r.status_code))
+                elif r.status_code >= 400:
+                    metrics.PAGE_DOWNLOAD_ERRORS.inc(host=host, reason=str(r.status_code))
+                    raise DownloadError(f"{url}: HTTP {r.status_code}")
+                else:
+                    limiter.on_success(latency)
+                    return r.content
+
+        if attempt < retries:
+            await asyncio.sleep(delay if delay is not None else backoff(attempt))
+
+    raise DownloadError(f"{url}: {error}")
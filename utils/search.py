@@ -0,0 +1,61 @@
+import asyncio
+import logging
+
+from config import SEARCH_TIMEOUT, SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE
+from utils.cache import TTLCache
+from utils.loader import get_all_sources, SourceUnavailable
+from utils.text import normalize
+
+logger = logging.getLogger(__name__)
+
+# (fonte, busca normalizada) -> resultados, compartilhado entre chats
+_search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+
+async def cached_search(source_name, source, query):
+    key = (source_name, normalize(query))
+    results = await _search_cache.get_or_fetch(key, lambda: source.search(query))
+
+    # lista vazia costuma ser erro da fonte: não guarda
+    if not results:
+        _search_cache.pop(key)
+    return results or []
+
+
+async def _search_one(source_name, source, query, timeout):
+    try:
+        # o timeout não cancela a busca compartilhada, que ainda preenche o cache
+        results = await asyncio.wait_for(cached_search(source_name, source, query), timeout)
+        return source_name, results, None
+    except asyncio.TimeoutError:
+        return source_name, [], "tempo esgotado"
+    except SourceUnavailable:
+        return source_name, [], "indisponível"
+    except Exception as e:
+        logger.warning("Erro na busca (%s): %r", source_name, e)
+        return source_name, [], "erro"
+
+
+# ================= FAN-OUT =================
+# consulta todas as fontes ao mesmo tempo e entrega cada resposta assim
+# que ela chega: (nome da fonte, resultados, erro ou None)
+async def search_all(query, timeout=SEARCH_TIMEOUT):
+    tasks = [
+        asyncio.create_task(_search_one(name, source, query, timeout))
+        for name, source in get_all_sources().items()
+    ]
+
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def stats():
+    return {
+        "hits": _search_cache.hits,
+        "misses": _search_cache.misses,
+        "size": len(_search_cache),
+    }
@@ -0,0 +1,182 @@
+import sys
+import time
+from collections import OrderedDict
+
+from config import (
+    SESSION_MAX_CHATS,
+    SESSION_TTL,
+    SESSION_MAX_BYTES,
+    SESSION_MAX_MESSAGES,
+    MESSAGE_DELETE_WINDOW,
+)
+
+STATS = {
+    "expired": 0,
+    "evicted": 0,
+}
+
+
+# ================= CAPÍTULO =================
+# registro compacto de capítulo para a sessão; o título do mangá é
+# internado, então centenas de capítulos apontam para a mesma string
+class ChapterRef:
+
+    __slots__ = ("name", "chapter_number", "url", "manga_title")
+
+    def __init__(self, name, chapter_number, url, manga_title):
+        self.name = name
+        self.chapter_number = chapter_number
+        self.url = url
+        self.manga_title = sys.intern(manga_title) if manga_title else manga_title
+
+    @classmethod
+    def from_dict(cls, chapter):
+        return cls(
+            chapter.get("name"),
+            chapter.get("chapter_number"),
+            chapter.get("url"),
+            chapter.get("manga_title"),
+        )
+
+    # formato dos jobs e do envio de capítulos
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "chapter_number": self.chapter_number,
+            "url": self.url,
+            "manga_title": self.manga_title,
+        }
+
+    def sizeof(self):
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.name)
+            + sys.getsizeof(self.url)
+        )
+
+
+# ================= SESSÃO =================
+class ChatSession:
+
+    __slots__ = ("results", "chapters", "source_name", "messages", "touched_at", "size")
+
+    def __init__(self):
+        # (nome da fonte, mangá) apontando para o cache global de buscas
+        self.results = ()
+        self.chapters = ()
+        self.source_name = None
+        # (message_id, enviada em)
+        self.messages = []
+        self.touched_at = time.time()
+        self.size = 0
+
+    def set_results(self, results):
+        self.results = results
+
+    def set_chapters(self, source_name, chapters):
+        self.source_name = source_name
+        self.chapters = tuple(ChapterRef.from_dict(ch) for ch in chapters)
+
+    def add_message(self, message_id, sent_at=None):
+        self.messages.append((message_id, sent_at or time.time()))
+        # as mais antigas já não são apagadas de qualquer jeito
+        if len(self.messages) > SESSION_MAX_MESSAGES:
+            del self.messages[:-SESSION_MAX_MESSAGES]
+
+    # ids que ainda podem ser apagados; os fora da janela do Telegram são descartados
+    def take_messages(self):
+        oldest = time.time() - MESSAGE_DELETE_WINDOW
+        messages, self.messages = self.messages, []
+        return [message_id for message_id, sent_at in messages if sent_at > oldest]
+
+    def sizeof(self):
+        size = sys.getsizeof(self) + sys.getsizeof(self.messages)
+        size += sum(sys.getsizeof(m) for m in self.messages)
+        size += sys.getsizeof(self.results) + sum(sys.getsizeof(r) for r in self.results)
+        size += sys.getsizeof(self.chapters) + sum(ch.sizeof() for ch in self.chapters)
+        return size
+
+
+# ================= STORE =================
+# sessões por chat com TTL, LRU e um teto de memória estimada
+class SessionStore:
+
+    def __init__(self, max_chats=SESSION_MAX_CHATS, ttl=SESSION_TTL, max_bytes=SESSION_MAX_BYTES):
+        self.max_chats = max_chats
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # sessão existente ou None se expirou / foi descartada
+    def peek(self, chat_id):
+        session = self._sessions.get(chat_id)
+        if session is None:
+            return None
+
+        if session.touched_at + self.ttl < time.time():
+            self._drop(chat_id)
+            STATS["expired"] += 1
+            return None
+
+        session.touched_at = time.time()
+        self._sessions.move_to_end(chat_id)
+        return session
+
+    def get(self, chat_id):
+        session = self.peek(chat_id)
+        if session is None:
+            session = self._sessions[chat_id] = ChatSession()
+        return session
+
+    # recalcula o tamanho depois de uma alteração e aplica os limites
+    def update(self, chat_id):
+        session = self._sessions.get(chat_id)
+        if session is None:
+            return
+
+        size = session.sizeof()
+        self._bytes += size - session.size
+        session.size = size
+        self._enforce(chat_id)
+
+    def _drop(self, chat_id):
+        session = self._sessions.pop(chat_id)
+        self._bytes -= session.size
+
+    def _enforce(self, keep):
+        now = time.time()
+        for chat_id in list(self._sessions):
+            session = self._sessions[chat_id]
+            if session.touched_at + self.ttl >= now:
+                break
+            self._drop(chat_id)
+            STATS["expired"] += 1
+
+        # a sessão que acabou de mudar fica, mesmo sozinha acima do teto
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_chats or self._bytes > self.max_bytes
+        ):
+            chat_id = next(iter(self._sessions))
+            if chat_id == keep:
+                self._sessions.move_to_end(keep)
+                chat_id = next(iter(self._sessions))
+            self._drop(chat_id)
+            STATS["evicted"] += 1
+
+    def memory(self):
+        return self._bytes
+
+    def stats(self):
+        return {
+            "chats": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            **STATS,
+        }
+
+
+SESSIONS = SessionStore()
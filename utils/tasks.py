@@ -0,0 +1,12 @@
+import asyncio
+
+# referências às tarefas em segundo plano até terminarem; sem elas o
+# coletor de lixo pode levar uma tarefa no meio do caminho
+BACKGROUND_TASKS = set()
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return task
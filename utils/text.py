@@ -0,0 +1,15 @@
+import re
+import unicodedata
+
+
+# "  Solo  Leveling: Ragnarök " -> "solo leveling: ragnarok"
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text.casefold()).strip()
+
+
+# chave para comparar títulos entre fontes: sem pontuação nem acentos
+# "Solo Leveling: Ragnarök!" -> "solo leveling ragnarok"
+def title_key(text):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", normalize(text))).strip()
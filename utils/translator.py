@@ -0,0 +1,110 @@
+import asyncio
+
+from config import (
+    TRANSLATION_CACHE_FILE,
+    TRANSLATION_CACHE_TTL,
+    TRANSLATION_CACHE_SIZE,
+    TRANSLATE_BATCH_WINDOW,
+    TRANSLATE_BATCH_CHARS,
+)
+from utils import http
+from utils.cache import TTLCache
+from utils.tasks import run_in_background
+
+TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+
+_cache = TTLCache(
+    TRANSLATION_CACHE_SIZE,
+    TRANSLATION_CACHE_TTL,
+    path=TRANSLATION_CACHE_FILE,
+)
+
+# (texto, future) esperando o próximo lote
+_pending = []
+_timer = None
+
+
+# ================= REQUISIÇÃO =================
+async def _request(text):
+    resp = await http.post(
+        TRANSLATE_URL,
+        params={
+            "client": "gtx",
+            "sl": "en",
+            "tl": "pt",
+            "dt": "t",
+        },
+        data={"q": text},
+    )
+    result = resp.json()
+    return "".join(item[0] for item in result[0] if item[0])
+
+
+# um texto por linha; se o tradutor juntar ou quebrar linhas, cai para
+# uma requisição por texto
+async def _translate_batch(texts):
+    if len(texts) == 1:
+        return [await _request(texts[0])]
+
+    lines = (await _request("\n".join(texts))).split("\n")
+    if len(lines) == len(texts):
+        return [line.strip() for line in lines]
+
+    return await asyncio.gather(*(_request(text) for text in texts))
+
+
+# ================= LOTE =================
+async def _flush():
+    global _pending, _timer
+
+    if _timer is not None:
+        _timer.cancel()
+        _timer = None
+
+    batch, _pending = _pending, []
+    if not batch:
+        return
+
+    results = []
+    try:
+        results = await _translate_batch([text for text, _ in batch])
+    except Exception as e:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+    finally:
+        for (_, future), translated in zip(batch, results):
+            if not future.done():
+                future.set_result(translated)
+        # lote cancelado no meio da requisição: quem esperava não fica preso
+        for _, future in batch:
+            if not future.done():
+                future.cancel()
+
+
+def _schedule():
+    global _timer
+
+    if sum(len(text) for text, _ in _pending) >= TRANSLATE_BATCH_CHARS:
+        run_in_background(_flush())
+    elif _timer is None:
+        _timer = asyncio.get_running_loop().call_later(
+            TRANSLATE_BATCH_WINDOW,
+            lambda: run_in_background(_flush()),
+        )
+
+
+async def _enqueue(text):
+    future = asyncio.get_running_loop().create_future()
+    _pending.append((" ".join(text.split()), future))
+    _schedule()
+    return await future
+
+
+# ================= API =================
+async def translate_to_pt(text):
+    return await _cache.get_or_fetch(text, lambda: _enqueue(text))
+
+
+def stats():
+    return {"hits": _cache.hits, "misses": _cache.misses, "size": len(_cache)}
@@ -0,0 +1,123 @@
+import asyncio
+import hmac
+import logging
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_DRAIN_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+# ================= RECEPTOR =================
+# responde 200 assim que o update entra na update_queue do Application;
+# os handlers rodam depois, fora da requisição
+class WebhookReceiver:
+
+    def __init__(self, application, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET):
+        self.application = application
+        self.path = path
+        self.secret = secret
+        self.draining = False
+        self.runner = None
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        return app
+
+    async def handle_update(self, request):
+        if self.secret and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret
+        ):
+            return web.Response(status=403)
+
+        # o Telegram reenvia depois; outra instância pode atender
+        if self.draining:
+            return web.Response(status=503)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        update = Update.de_json(data, self.application.bot)
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(self, request):
+        return web.Response(status=503 if self.draining else 200, text="ok")
+
+    async def start(self, host=WEBHOOK_HOST, port=WEBHOOK_PORT):
+        self.runner = web.AppRunner(self.make_app(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+
+    async def drain(self, timeout=WEBHOOK_DRAIN_TIMEOUT):
+        self.draining = True
+        try:
+            await asyncio.wait_for(self.application.update_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "%d updates não processados ao desligar",
+                self.application.update_queue.qsize(),
+            )
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+# ================= CICLO DE VIDA =================
+# equivalente ao run_polling, com o receptor acima no lugar do Updater
+async def serve_webhook(application, stop_event=None):
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    if not WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook exige WEBHOOK_URL (endereço público https)")
+
+    receiver = WebhookReceiver(application)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+
+    try:
+        # o receptor sobe antes do registro: updates que chegarem logo após
+        # o set_webhook já encontram alguém ouvindo
+        await application.start()
+        await receiver.start()
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True,
+        )
+        print(f"🌐 Webhook ouvindo em {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+        await stop_event.wait()
+    finally:
+        await receiver.drain()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
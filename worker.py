@@ -0,0 +1,181 @@
+import os
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+
+from telegram.ext import ExtBot
+from telegram.error import TelegramError
+
+from config import (
+    BOT_TOKEN,
+    TELEGRAM_API_URL,
+    DOWNLOAD_WORKERS,
+    PIPELINE_BATCH,
+    WORKER_PROCESSES,
+    JOB_HEARTBEAT_SECONDS,
+    BROKER_POLL_INTERVAL,
+    METRICS_HOST,
+    METRICS_PORT,
+)
+
+import main
+from utils import queue_manager
+from utils import metrics
+from utils import file_cache
+from utils import page_store
+from utils import profiler
+from utils import executors
+from utils.cache import flush_all
+from utils.http import close_clients
+from utils.rate_limiter import TelegramRateLimiter, BULK
+
+# processos de download separados do bot (WORKER_MODE=external):
+#
+#   python worker.py --processes 4
+#
+# cada processo roda DOWNLOAD_WORKERS consumidores que pegam jobs do
+# QUEUE_DB, renovam o lease enquanto trabalham e falam direto com o chat
+# pela Bot API
+
+
+# =====================================================
+# CONSUMIDOR
+# =====================================================
+async def keep_alive(worker_id):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        queue_manager.heartbeat(worker_id, os.getpid())
+
+
+async def report_expired(bot):
+    for job in queue_manager.expire_jobs():
+        metrics.JOBS_FINISHED.inc(status="failed")
+        logging.warning("Job %s desistido após %s entregas", job["id"], job["attempts"])
+        try:
+            await bot.send_message(
+                job["chat_id"],
+                f"❌ Cap {job['chapter'].get('chapter_number')} não foi enviado: "
+                "o download foi interrompido várias vezes.",
+                rate_limit_args={"priority": BULK},
+            )
+        except TelegramError:
+            pass
+
+
+async def consume(bot, worker_id):
+    print(f"✅ Worker {worker_id} iniciado")
+    heartbeat = asyncio.create_task(keep_alive(worker_id))
+    try:
+        while True:
+            queue_manager.heartbeat(worker_id, os.getpid())
+            await report_expired(bot)
+
+            jobs = queue_manager.claim_jobs(worker_id, PIPELINE_BATCH)
+            if not jobs:
+                await asyncio.sleep(BROKER_POLL_INTERVAL)
+                continue
+
+            try:
+                await main.process_jobs(bot, jobs, report_progress=True)
+            except Exception:
+                logging.exception("Erro no worker %s", worker_id)
+            # o que sobrou de um lote com erro volta para a fila
+            queue_manager.release_jobs(worker_id, refund=False)
+    finally:
+        heartbeat.cancel()
+        queue_manager.release_jobs(worker_id)
+        queue_manager.remove_worker(worker_id)
+
+
+# =====================================================
+# PROCESSO
+# =====================================================
+async def serve(number, processes):
+    kwargs = {}
+    if TELEGRAM_API_URL:
+        kwargs["base_url"] = TELEGRAM_API_URL.rstrip("/") + "/bot"
+    # os limites da Bot API são divididos com o bot e os outros processos
+    limiter = TelegramRateLimiter(processes=processes + 1)
+    bot = ExtBot(BOT_TOKEN, rate_limiter=limiter, **kwargs)
+    await bot.initialize()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    monitor = profiler.LoopMonitor()
+    monitor.start()
+
+    # cada processo com a sua porta, depois da do bot
+    if METRICS_PORT:
+        try:
+            await metrics.start_server(METRICS_HOST, METRICS_PORT + number)
+        except OSError as e:
+            logging.warning("Métricas do processo %s desligadas: %s", number, e)
+
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    consumers = [
+        asyncio.create_task(consume(bot, f"{prefix}-{n}"))
+        for n in range(1, DOWNLOAD_WORKERS + 1)
+    ]
+
+    try:
+        await stop.wait()
+    finally:
+        # jobs interrompidos voltam para a fila sem gastar uma entrega
+        for task in consumers:
+            task.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        monitor.stop()
+        await metrics.stop_server()
+        await bot.shutdown()
+        await close_clients()
+        file_cache.close()
+        page_store.close()
+        queue_manager.close()
+        flush_all()
+        executors.shutdown()
+        print(f"🛑 Processo {number} encerrado")
+
+
+def run_process(number, processes):
+    asyncio.run(serve(number, processes))
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Workers de download da Biblioteca308")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES)
+    args = parser.parse_args()
+
+    # WORKER_PROCESSES conta os processos de todas as máquinas
+    total = max(WORKER_PROCESSES, args.processes)
+
+    if args.processes <= 1:
+        run_process(1, total)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_process, args=(number, total), name=f"worker-{number}")
+        for number in range(1, args.processes + 1)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    run()